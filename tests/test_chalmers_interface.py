@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+from unittest import TestCase, mock
+
+import numpy as np
+
+import pandas as pd
+
+import pyomo.environ as pyo
+from pyomo.opt import SolverResults, TerminationCondition
+
+from tradingplatformpoc.agent.block_agent import BlockAgent
+from tradingplatformpoc.digitaltwin.static_digital_twin import StaticDigitalTwin
+from tradingplatformpoc.simulation_runner.chalmers_interface import InfeasibilityError, SolverTimeoutError, \
+    build_supply_and_demand_dfs, get_value_per_agent, get_value_per_period, handle_infeasibility, sum_for_all_agents
+from tradingplatformpoc.trading_platform_utils import hourly_datetime_array_between
+
+DATETIME_ARRAY = hourly_datetime_array_between(datetime(2019, 3, 1, 0, tzinfo=timezone.utc),
+                                               datetime(2019, 3, 2, 23, tzinfo=timezone.utc))
+
+
+class Test(TestCase):
+    def test_build_supply_and_demand_dfs(self):
+        """Test that net usage is split into demand (positive) and supply (negative), per agent and hour."""
+        elec_values = np.linspace(-10, 10, len(DATETIME_ARRAY))
+        cooling_values = np.linspace(5, 0, len(DATETIME_ARRAY))
+        agent_1 = BlockAgent(StaticDigitalTwin(1000.0, electricity_usage=pd.Series(elec_values, index=DATETIME_ARRAY),
+                                               cooling_usage=pd.Series(cooling_values, index=DATETIME_ARRAY)))
+        agent_2 = BlockAgent(StaticDigitalTwin(1000.0, hot_water_usage=pd.Series(2.0, index=DATETIME_ARRAY),
+                                               hot_water_production=pd.Series(3.0, index=DATETIME_ARRAY)))
+        elec_demand, elec_supply, high_heat_demand, high_heat_supply, low_heat_demand, low_heat_supply, \
+            cooling_demand, cooling_supply = build_supply_and_demand_dfs([agent_1, agent_2], DATETIME_ARRAY[1], 24)
+
+        self.assertEqual((2, 24), elec_demand.shape)
+        np.testing.assert_array_equal(np.maximum(elec_values[1:25], 0), elec_demand.iloc[0, :])
+        np.testing.assert_array_equal(np.maximum(-elec_values[1:25], 0), elec_supply.iloc[0, :])
+        np.testing.assert_array_equal(cooling_values[1:25], cooling_demand.iloc[0, :])
+        self.assertEqual(0, cooling_supply.to_numpy().sum())
+        self.assertEqual(0, elec_demand.iloc[1, :].sum())
+        self.assertEqual(0, high_heat_demand.to_numpy().sum())
+        np.testing.assert_array_equal(np.ones(24), high_heat_supply.iloc[1, :])
+        self.assertEqual(0, low_heat_demand.to_numpy().sum() + low_heat_supply.to_numpy().sum())
+
+    def test_sum_for_all_agents(self):
+        """Test that values are summed per period, also for periods that only some agents have values for."""
+        dict_per_agent_and_period = {'agent1': {DATETIME_ARRAY[0]: 1.0, DATETIME_ARRAY[1]: 2.0},
+                                     'agent2': {DATETIME_ARRAY[1]: 3.0, DATETIME_ARRAY[2]: 4.0}}
+        self.assertEqual({DATETIME_ARRAY[0]: 1.0, DATETIME_ARRAY[1]: 5.0, DATETIME_ARRAY[2]: 4.0},
+                         sum_for_all_agents(dict_per_agent_and_period))
+
+    def test_get_value_per_agent_and_period(self):
+        """Test extracting variable values from a model, keyed by agent GUID and period."""
+        model = pyo.ConcreteModel()
+        model.T = pyo.Set(initialize=range(3))
+        model.I = pyo.Set(initialize=range(2))  # noqa: E741
+        model.SOCBES = pyo.Var(model.I, model.T, initialize=lambda m, i, t: 10 * i + t + 1)
+        model.heat_dump = pyo.Var(model.T, initialize=lambda m, t: t / 3)
+
+        per_agent = get_value_per_agent(model, DATETIME_ARRAY[0], 'SOCBES', ['a', 'b'], lambda i: i > 0,
+                                        lambda i: 2.0)
+        self.assertEqual({'b': {DATETIME_ARRAY[0]: 5.5, DATETIME_ARRAY[1]: 6.0, DATETIME_ARRAY[2]: 6.5}}, per_agent)
+        per_period = get_value_per_period(model, DATETIME_ARRAY[0], 'heat_dump')
+        self.assertEqual([DATETIME_ARRAY[0], DATETIME_ARRAY[1], DATETIME_ARRAY[2]], list(per_period.keys()))
+        self.assertAlmostEqual(2 / 3, per_period[DATETIME_ARRAY[2]], places=5)
+
+    def test_handle_infeasibility(self):
+        """Test that 'optimal' and 'feasible' pass, and that 'infeasible' raises an InfeasibilityError."""
+        model = pyo.ConcreteModel()
+        model.x = pyo.Var(initialize=0)
+        model.c = pyo.Constraint(expr=model.x >= 1)
+        results = SolverResults()
+        for termination_condition in [TerminationCondition.optimal, TerminationCondition.feasible]:
+            results.solver.termination_condition = termination_condition
+            handle_infeasibility(model, results, DATETIME_ARRAY[0], 24, ['a'])
+        results.solver.termination_condition = TerminationCondition.infeasible
+        with self.assertRaises(InfeasibilityError) as cm:
+            handle_infeasibility(model, results, DATETIME_ARRAY[0], 24, ['a'])
+        self.assertNotIsInstance(cm.exception, SolverTimeoutError)
+        self.assertEqual({'c'}, cm.exception.constraints)
+
+    def test_handle_infeasibility_time_limit(self):
+        """Test that reaching the time limit raises a SolverTimeoutError, without looking for infeasible constraints."""
+        results = SolverResults()
+        results.solver.termination_condition = TerminationCondition.maxTimeLimit
+        with mock.patch('tradingplatformpoc.simulation_runner.chalmers_interface.find_infeasible_constraints') \
+                as mock_find_infeasible_constraints:
+            with self.assertRaises(SolverTimeoutError) as cm:
+                handle_infeasibility(mock.MagicMock(), results, DATETIME_ARRAY[0], 24, ['a'])
+        mock_find_infeasible_constraints.assert_not_called()
+        self.assertEqual(['a'], cm.exception.agent_names)
+        self.assertEqual(set(), cm.exception.constraints)
+        self.assertEqual(DATETIME_ARRAY[24], cm.exception.horizon_end)
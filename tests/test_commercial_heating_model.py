@@ -1,7 +1,10 @@
 from unittest import TestCase
 
+import numpy as np
+
 from tradingplatformpoc.generate_data.generation_functions.non_residential.common import \
-    probability_of_0_space_heating, space_heating_given_more_than_0
+    probability_of_0_space_heating, probability_of_0_space_heating_vec, space_heating_given_more_than_0, \
+    space_heating_given_more_than_0_vec
 
 
 class Test(TestCase):
@@ -20,3 +23,10 @@ class Test(TestCase):
         self.assertAlmostEqual(6.594911, space_heating_given_more_than_0(10))
         self.assertAlmostEqual(1.7359935, space_heating_given_more_than_0(12.5))
         self.assertEqual(0.0, space_heating_given_more_than_0(15))
+
+    def test_vectorized_versions(self):
+        temperatures = np.array([-10, 0, 4.9, 5.5, 7, 10, 12.5, 15, 19.9, 20, 25])
+        np.testing.assert_allclose([probability_of_0_space_heating(t) for t in temperatures],
+                                   probability_of_0_space_heating_vec(temperatures))
+        np.testing.assert_allclose([space_heating_given_more_than_0(t) for t in temperatures],
+                                   space_heating_given_more_than_0_vec(temperatures))
@@ -1,6 +1,8 @@
 import datetime
 from unittest import TestCase
 
+import numpy as np
+
 import pytz
 
 from tradingplatformpoc.price.heating_price import HeatingPrice, calculate_jan_feb_avg_heating_sold, \
@@ -46,6 +48,14 @@ class Test(TestCase):
         """Test marginal price for summer/winter periods: summer should be lower than winter."""
         self.assertTrue(self.dhp.get_base_marginal_price(5) < self.dhp.get_base_marginal_price(2))
 
+    def test_get_yearly_grid_fee(self):
+        """Test that the grid fee bracket changes at, not after, each bracket limit."""
+        self.assertAlmostEqual(1152 + 1116 * 49.5, self.dhp.get_yearly_grid_fee(49.5))
+        self.assertAlmostEqual(3060 + 1068 * 50, self.dhp.get_yearly_grid_fee(50))
+        self.assertAlmostEqual(18348 + 972 * 399, self.dhp.get_yearly_grid_fee(399))
+        self.assertAlmostEqual(33696 + 936 * 400, self.dhp.get_yearly_grid_fee(400))
+        self.assertEqual([1152, 8148 + 1020 * 150], self.dhp.get_yearly_grid_fee_vec(np.array([0, 150])).tolist())
+
     def test_get_grid_fee_for_month(self):
         self.assertAlmostEqual(571.758904109589, self.dhp.get_grid_fee_for_month(5, 2019, 10))
 
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta, timezone
-from unittest import TestCase
+from unittest import TestCase, mock
 
 import numpy as np
 
@@ -12,17 +12,21 @@ import polars as pl
 from tradingplatformpoc.compress import bz2_decompress_pickle
 from tradingplatformpoc.data.preprocessing import read_temperature_data
 from tradingplatformpoc.generate_data.generate_mock_data import DATA_PATH
-from tradingplatformpoc.generate_data.generation_functions.common import is_day_before_major_holiday_sweden, \
-    is_major_holiday_sweden
+from tradingplatformpoc.generate_data.generation_functions.common import get_major_holiday_flags, \
+    is_day_before_major_holiday_sweden, is_major_holiday_sweden
 from tradingplatformpoc.generate_data.generation_functions.non_residential.commercial import \
     get_commercial_cooling_consumption_factor
 from tradingplatformpoc.generate_data.generation_functions.non_residential.common import \
     probability_of_0_space_heating, simulate_cooling, simulate_space_heating
-from tradingplatformpoc.generate_data.generation_functions.non_residential.office import read_office_dicts
+from tradingplatformpoc.generate_data.generation_functions.non_residential.office import read_office_dicts, \
+    read_office_tables
 from tradingplatformpoc.generate_data.generation_functions.non_residential.school import \
     get_school_heating_consumption_hourly_factor, is_break
 from tradingplatformpoc.generate_data.generation_functions.residential.electricity import \
     simulate_series_with_log_energy_model
+from tradingplatformpoc.generate_data.mock_data_utils import calculate_seed_from_string, get_mock_ids_to_reuse, \
+    join_list_of_polar_dfs, join_list_of_polar_dfs_with_same_datetimes
+from tradingplatformpoc.sql.mock_data.crud import mock_data_binary_to_df, mock_data_df_to_db_dict
 from tradingplatformpoc.trading_platform_utils import hourly_datetime_array_between
 
 
@@ -40,6 +44,15 @@ class Test(TestCase):
         new_years_eve_in_tz_far_away = pd.Timestamp('2017-12-31T01', tz='Australia/Sydney').to_pydatetime()
         self.assertFalse(is_day_before_major_holiday_sweden(new_years_eve_in_tz_far_away))
 
+    def test_get_major_holiday_flags(self):
+        """Test that the per-date holiday flags agree with the per-row predicates, Swedish time zone included."""
+        datetimes = pd.Series(pd.date_range('2017-12-22T20', '2018-01-07T04', freq='h', tz='UTC'))
+        is_major_holiday, is_pre_major_holiday = get_major_holiday_flags(datetimes)
+        self.assertEqual([is_major_holiday_sweden(dt) for dt in datetimes], list(is_major_holiday))
+        self.assertEqual([is_day_before_major_holiday_sweden(dt) for dt in datetimes], list(is_pre_major_holiday))
+        # 23:00 UTC on the 23rd is midnight on Christmas Eve in Sweden
+        self.assertTrue(is_major_holiday[datetimes == pd.Timestamp('2017-12-23T23', tz='UTC')].all())
+
     def test_non_residential_heating(self):
         """
         Test space heating data generation.
@@ -84,6 +97,16 @@ class Test(TestCase):
         self.assertTrue(is_break(datetime(2019, 7, 1, tzinfo=timezone.utc)))
         self.assertFalse(is_break(datetime(2019, 9, 1, tzinfo=timezone.utc)))
 
+    def test_get_school_heating_consumption_hourly_factor(self):
+        """Test that the vectorized factor agrees with is_break, weekends and opening hours, leap years included."""
+        datetimes = pl.Series('datetime',
+                              hourly_datetime_array_between(datetime(2020, 1, 1, tzinfo=timezone.utc),
+                                                            datetime(2020, 12, 31, 23, tzinfo=timezone.utc)))
+        factors = get_school_heating_consumption_hourly_factor(datetimes)
+        expected = [1.0 if dt.weekday() < 5 and not is_break(dt) and 8 <= dt.hour < 17 else 0.5
+                    for dt in datetimes]
+        self.assertEqual(expected, list(factors))
+
     def test_commercial_cooling(self):
         # Set the start date and time
         start_date = datetime(2019, 1, 1, 0, 0, 0)
@@ -110,3 +133,64 @@ class Test(TestCase):
         elec_dict, hot_water_dict = read_office_dicts()
         self.assertTrue(len(elec_dict.items()) > 0)
         self.assertTrue(len(hot_water_dict.items()) > 0)
+
+    def test_read_office_tables(self):
+        """Test that read_office_tables parses the CSV once, returning the same read-only arrays on subsequent calls."""
+        elec_table, hot_water_table = read_office_tables()
+        self.assertEqual((13, 24), elec_table.shape)
+        self.assertEqual(read_office_dicts()[0][(1, 0)], elec_table[1, 0])
+        self.assertFalse(elec_table.flags.writeable)
+        self.assertIs(read_office_tables(), read_office_tables())
+
+    def test_mock_data_binary_round_trip(self):
+        """Test that mock data survives being stored as Parquet, and that the older JSON format can still be read."""
+        df = pl.DataFrame({'datetime': hourly_datetime_array_between(datetime(2019, 1, 1, tzinfo=timezone.utc),
+                                                                     datetime(2019, 1, 2, tzinfo=timezone.utc)),
+                           'agent_elec_cons': np.linspace(0, 1, 25)})
+        db_dict = mock_data_df_to_db_dict('agent', {}, df)
+        self.assertTrue(df.frame_equal(mock_data_binary_to_df(db_dict['mock_data'])))
+        legacy_binary = b'{"agent_elec_cons": {"2019-01-01 00:00:00.000000": 0.5}}'
+        legacy_df = mock_data_binary_to_df(legacy_binary)
+        self.assertEqual(['datetime', 'agent_elec_cons'], legacy_df.columns)
+        self.assertEqual(0.5, legacy_df['agent_elec_cons'][0])
+
+    def test_join_list_of_polar_dfs_with_same_datetimes(self):
+        """Test that gathering the columns gives the same result as joining on datetime."""
+        datetimes = hourly_datetime_array_between(datetime(2019, 1, 1, tzinfo=timezone.utc),
+                                                  datetime(2019, 1, 2, tzinfo=timezone.utc))
+        dfs = [pl.DataFrame({'datetime': datetimes, 'a_elec_cons': np.arange(25.0)}),
+               pl.DataFrame({'datetime': datetimes, 'b_elec_cons': np.ones(25), 'b_cooling_cons': np.zeros(25)})]
+        self.assertTrue(join_list_of_polar_dfs(dfs).frame_equal(join_list_of_polar_dfs_with_same_datetimes(dfs)))
+        self.assertTrue(join_list_of_polar_dfs_with_same_datetimes([]).is_empty())
+
+    def test_calculate_seed_from_string(self):
+        """Seeds must stay the same between versions, otherwise re-generated mock data would change."""
+        self.assertEqual(4285596235, calculate_seed_from_string("[('Atemp', 1000)]"))
+        self.assertEqual(2018687061, calculate_seed_from_string(''))
+
+    def test_zero_area_non_residential(self):
+        """With no area, there is nothing to simulate, so we should get zeros."""
+        input_df = read_temperature_data()
+        lazy_inputs = pl.from_pandas(input_df).lazy()
+        heating = simulate_space_heating(0, 1, lazy_inputs, 25, get_school_heating_consumption_hourly_factor,
+                                         len(input_df.index)).collect()
+        cooling = simulate_cooling(0, 34, 0.2, get_commercial_cooling_consumption_factor, 1, lazy_inputs,
+                                   len(input_df.index)).collect()
+        self.assertEqual(len(input_df.index), heating.height)
+        self.assertEqual(0, heating['value'].abs().sum())
+        self.assertEqual(0, cooling['value'].abs().sum())
+
+    def test_get_mock_ids_to_reuse_queries_once_per_relevant_config(self):
+        """Agents which only differ in things irrelevant for mock data generation should share one database query."""
+        agents = [{'db_id': 'a', 'Atemp': 1000, 'FractionCommercial': 0, 'FractionSchool': 0, 'FractionOffice': 0,
+                   'PVArea': 10},
+                  {'db_id': 'b', 'Atemp': 1000, 'FractionCommercial': 0, 'FractionSchool': 0, 'FractionOffice': 0,
+                   'PVArea': 20},
+                  {'db_id': 'c', 'Atemp': 2000, 'FractionCommercial': 0, 'FractionSchool': 0, 'FractionOffice': 0,
+                   'PVArea': 10}]
+        equivalent = {'agent_id': 'x', 'mock_data_id': 'y'}
+        with mock.patch('tradingplatformpoc.generate_data.mock_data_utils.check_if_agent_equivalent_in_db',
+                        return_value=equivalent) as check:
+            mock_ids_to_reuse = get_mock_ids_to_reuse(agents, {}, True)
+        self.assertEqual(2, check.call_count)
+        self.assertEqual({'a': equivalent, 'b': equivalent, 'c': equivalent}, mock_ids_to_reuse)
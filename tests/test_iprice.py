@@ -10,6 +10,7 @@ from tests import utility_test_objects
 from tradingplatformpoc.price.electricity_price import ElectricityPrice, \
     calculate_top_three_hourly_outtakes_for_month, calculate_total_for_month
 from tradingplatformpoc.price.heating_price import HeatingPrice, calculate_consumption_this_month
+from tradingplatformpoc.price.iprice import get_values_for_month
 from tradingplatformpoc.trading_platform_utils import hourly_datetime_array_between
 
 FEB_1_1_AM = datetime(2019, 2, 1, 1, 0, 0, tzinfo=timezone.utc)
@@ -124,6 +125,16 @@ class TestHeatingPrice(TestCase):
         self.assertAlmostEqual(50.0, calculate_consumption_this_month(ds.all_external_sells, 2019, 2))
         self.assertAlmostEqual(0.0, calculate_consumption_this_month(ds.all_external_sells, 2019, 4))
 
+    def test_get_values_for_month(self):
+        """Test that get_values_for_month gives the same result for sorted and unsorted series"""
+        sorted_series = pd.Series(np.arange(len(DATETIME_ARRAY)), index=DATETIME_ARRAY)
+        unsorted_series = sorted_series.iloc[::-1]
+        for year, month in [(2018, 12), (2019, 2), (2019, 12), (2020, 1), (2020, 2)]:
+            index = sorted_series.index
+            expected = sorted_series[(index.year == year) & (index.month == month)]
+            pd.testing.assert_series_equal(expected, get_values_for_month(sorted_series, year, month))
+            pd.testing.assert_series_equal(expected, get_values_for_month(unsorted_series, year, month).sort_index())
+
     def test_get_exact_retail_price_heating(self):
         """Test basic functionality of get_exact_retail_price for HIGH_TEMP_HEAT"""
         ds = HeatingPrice(heating_wholesale_price_fraction=area_info['ExternalHeatingWholesalePriceFraction'])
@@ -136,6 +147,18 @@ class TestHeatingPrice(TestCase):
         self.assertAlmostEqual(26.230860554970143,
                                ds.get_exact_retail_price(datetime(2019, 3, 2, 3), include_tax=True))
 
+    def test_get_exact_retail_price_heating_after_more_sells(self):
+        """Test that the exact price for a month is recalculated when more sells are added"""
+        ds = HeatingPrice(heating_wholesale_price_fraction=area_info['ExternalHeatingWholesalePriceFraction'])
+        ds.add_external_sell(FEB_1_1_AM, 100)
+        ds.add_external_sell(datetime(2019, 3, 1, 1, tzinfo=timezone.utc), 100)
+        price_before = ds.get_exact_retail_price(datetime(2019, 3, 1, 1, tzinfo=timezone.utc), include_tax=True)
+        self.assertEqual(price_before,
+                         ds.get_exact_retail_price(datetime(2019, 3, 1, 2, tzinfo=timezone.utc), include_tax=True))
+        ds.add_external_sell(datetime(2019, 3, 1, 2, tzinfo=timezone.utc), 50)
+        self.assertNotEqual(price_before,
+                            ds.get_exact_retail_price(datetime(2019, 3, 1, 1, tzinfo=timezone.utc), include_tax=True))
+
     def test_heating_tax(self):
         """Test that unless anything else is specified, the tax is 0."""
         self.assertEqual(0, heat_pricing.tax)
@@ -2,9 +2,11 @@ from collections import Counter
 from datetime import datetime
 from unittest import TestCase
 
-from tradingplatformpoc.trading_platform_utils import add_all_to_nested_dict, energy_to_water_volume, \
-    flatten_collection, get_final_storage_level, get_if_exists_else, get_intersection, minus_n_hours, \
-    water_volume_to_energy
+import pandas as pd
+
+from tradingplatformpoc.trading_platform_utils import add_all_to_nested_dict, calculate_solar_prod, \
+    calculate_solar_prod_for_agents, energy_to_water_volume, flatten_collection, get_final_storage_level, \
+    get_glpk_solver, get_if_exists_else, get_intersection, minus_n_hours, water_volume_to_energy
 
 
 class Test(TestCase):
@@ -13,6 +15,14 @@ class Test(TestCase):
         t2 = minus_n_hours(datetime(2021, 12, 10, 11, 0, 0), 1)
         self.assertEqual(datetime(2021, 12, 10, 10, 0, 0), t2)
 
+    def test_calculate_solar_prod_for_agents(self):
+        """Test that calculating for several agents at once gives the same result as one at a time."""
+        irradiation = pd.Series([0.0, 150.0, 600.0], index=pd.date_range('2019-06-01', periods=3, freq='h'))
+        pv_prod = calculate_solar_prod_for_agents(irradiation, {'a': 100, 'b': 0}, {'a': 0.165, 'b': 0.2})
+        self.assertEqual(['a', 'b'], list(pv_prod.columns))
+        pd.testing.assert_series_equal(calculate_solar_prod(irradiation, 100, 0.165), pv_prod['a'], check_names=False)
+        self.assertEqual(0, pv_prod['b'].sum())
+
     def test_get_intersection_of_lists(self):
         """Test that get_intersection works for two lists."""
         list1 = [1, 2, 3]
@@ -90,3 +100,12 @@ class Test(TestCase):
         """Test that energy_to_water_volume and water_volume_to_energy are each other's inverse."""
         self.assertAlmostEqual(75.35731666666666, water_volume_to_energy(1, 65))
         self.assertAlmostEqual(1.0, energy_to_water_volume(75.35731666666666, 65))
+
+    def test_get_glpk_solver(self):
+        """Test that the MIP gap and time limit are only passed on as GLPK options if specified."""
+        solver = get_glpk_solver()
+        self.assertNotIn('mipgap', solver.options)
+        self.assertNotIn('tmlim', solver.options)
+        solver = get_glpk_solver(mip_rel_gap=0.05, time_limit_s=10)
+        self.assertEqual(0.05, solver.options['mipgap'])
+        self.assertEqual(10, solver.options['tmlim'])
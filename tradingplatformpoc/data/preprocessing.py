@@ -142,7 +142,7 @@ def clean(df: pd.DataFrame) -> pd.DataFrame:
     """
     df = df.set_index('datetime')
     datetime_range = pd.date_range(start=df.index.min(), end=df.index.max(),
-                                   freq="1h", tz='utc')
+                                   freq="1h", tz='utc', name='datetime')
     missing_datetimes = datetime_range.difference(df.index)
     if len(missing_datetimes) > 0:
         logger.info("{} missing datetime/s in data. Will fill using linear interpolation."
@@ -162,5 +162,6 @@ def read_and_process_input_data() -> pd.DataFrame:
            read_energy_data(),
            read_office_data()]
     dfs_cleaned = [clean(df) for df in dfs]
-    df_merged = functools.reduce(lambda left, right: left.join(right, on='datetime', how='inner'), dfs_cleaned)
+    # All cleaned DataFrames are indexed by (sorted, unique) datetime, so join on the index directly
+    df_merged = functools.reduce(lambda left, right: left.join(right, how='inner'), dfs_cleaned)
     return df_merged.reset_index()
@@ -1,6 +1,10 @@
+import concurrent.futures
+import functools
 import logging
 import os
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
 
 import pandas as pd
 
@@ -19,16 +23,17 @@ from tradingplatformpoc.generate_data.generation_functions.non_residential.comme
     get_commercial_heating_consumption_hourly_factor
 from tradingplatformpoc.generate_data.generation_functions.non_residential.common import simulate_area_electricity, \
     simulate_cooling, simulate_heating
-from tradingplatformpoc.generate_data.generation_functions.non_residential.office import read_office_dicts, \
-    simulate_office_based_on_daily, simulate_office_based_on_hourly
+from tradingplatformpoc.generate_data.generation_functions.non_residential.office import OFFICE_ELEC_RAW_COL, \
+    OFFICE_HOT_WATER_RAW_COL, add_office_daily_columns, read_office_tables, simulate_office_based_on_hourly
 from tradingplatformpoc.generate_data.generation_functions.non_residential.school import \
     get_school_heating_consumption_hourly_factor
 from tradingplatformpoc.generate_data.generation_functions.residential.electricity import \
-    property_electricity, simulate_household_electricity_aggregated
+    predict_without_autoregression, property_electricity, simulate_household_electricity_aggregated
 from tradingplatformpoc.generate_data.generation_functions.residential.heating import simulate_residential_total_heating
 from tradingplatformpoc.generate_data.mock_data_utils import \
     calculate_seed_from_string, get_cooling_cons_key, get_elec_cons_key, get_equivalent_mock_data, \
-    get_hot_tap_water_cons_key, get_mock_ids_to_reuse, get_space_heat_cons_key, join_list_of_polar_dfs
+    get_hot_tap_water_cons_key, get_mock_ids_to_reuse, get_space_heat_cons_key, join_list_of_polar_dfs, \
+    join_list_of_polar_dfs_with_same_datetimes
 from tradingplatformpoc.sql.agent.crud import get_block_agent_dicts_from_id_list
 from tradingplatformpoc.sql.config.crud import get_all_agent_name_id_pairs_in_config, get_mock_data_constants
 from tradingplatformpoc.sql.input_data.crud import read_inputs_df_for_mock_data_generation
@@ -80,7 +85,9 @@ def get_generated_mock_data(config_id: str) -> pd.DataFrame:
     logger.info("Running mock data generation.")
     data_set = run(config_id)
     logger.info("Finished getting mock data.")
-    return data_set.to_pandas().set_index('datetime')
+    # Mock data is generated and stored as float32, but the rest of the simulation works with (JSON-serializable)
+    # float64 values
+    return data_set.with_columns(pl.exclude('datetime').cast(pl.Float64)).to_pandas().set_index('datetime')
 
 
 def run(config_id: str, reuse: bool = True) -> Union[pl.DataFrame, pl.LazyFrame]:
@@ -125,7 +132,7 @@ def run(config_id: str, reuse: bool = True) -> Union[pl.DataFrame, pl.LazyFrame]
         
         # Join dataframes
         logger.info('Joining simulated dataframes.')
-        joined_dfs_new = join_list_of_polar_dfs(list(dfs_new.values()))
+        joined_dfs_new = join_list_of_polar_dfs_with_same_datetimes(list(dfs_new.values()))
 
     else:
         logger.info('Found no new agents to simulate data for')
@@ -161,6 +168,24 @@ def run(config_id: str, reuse: bool = True) -> Union[pl.DataFrame, pl.LazyFrame]
         raise Exception('Mock data neither generated nor found!')
 
 
+@functools.lru_cache(maxsize=1)
+def read_prepared_inputs() -> pl.DataFrame:
+    """
+    Reads input data (temperature, irradiation and heat consumption) from the database, and adds the columns that the
+    simulations need, which don't depend on the agent. The input data in the database is only ever inserted once, so
+    the result is cached, and subsequent mock data generation runs in the same process skip this preparation.
+    """
+    # Load tables for office data
+    office_elec_table, office_hot_water_table = read_office_tables()
+
+    df_inputs_pandas = read_inputs_df_for_mock_data_generation()
+    df_inputs = extract_datetime_features_from_inputs_df(df_inputs_pandas)
+    # The office month-and-hour values don't depend on the agent, so we add them here once, for all agents.
+    # Rechunk once here too, so that the columns are contiguous for all the simulations below
+    return add_office_daily_columns(df_inputs.lazy(), office_elec_table, office_hot_water_table). \
+        collect().rechunk()
+
+
 def simulate_for_agents(agent_dicts: List[Dict[str, Any]], mock_data_constants: Dict[str, Any], key='db_id'
                         ) -> Dict[str, pl.DataFrame]:
     # So we have established that we need to generate new mock data.
@@ -170,12 +195,7 @@ def simulate_for_agents(agent_dicts: List[Dict[str, Any]], mock_data_constants:
     model = bz2_decompress_pickle(resource_filename(DATA_PATH, 'models/household_electricity_model.pbz2'))
     logger.debug('Model loaded')
 
-    # Load dicts for office data
-    office_elec_dict, office_hot_water_dict = read_office_dicts()
-
-    # Read input data: Temperature, irradiation and heat consumption
-    df_inputs_pandas = read_inputs_df_for_mock_data_generation()
-    df_inputs = extract_datetime_features_from_inputs_df(df_inputs_pandas)
+    df_inputs = read_prepared_inputs()
     logger.debug('Input data loaded')
 
     # Extract indices
@@ -183,26 +203,30 @@ def simulate_for_agents(agent_dicts: List[Dict[str, Any]], mock_data_constants:
     n_rows = df_inputs.height
     lazy_inputs = df_inputs.lazy()
 
-    # Dictionary to fill with dataframes, starting with empty to simplify join
-    dfs_new: Dict[str, pl.DataFrame] = {}
-    # Generation loop
-    for agent_dict in agent_dicts:
+    # The household electricity model's prediction is the same for all agents, only the random noise differs
+    household_elec_z_hat = predict_without_autoregression(df_inputs, model)
 
-        logger.info('Generating new data for ' + agent_dict[key])
-        output_per_block = simulate(mock_data_constants, agent_dict, lazy_inputs,
-                                    n_rows, model, output_per_actor.clone(), key,
-                                    office_elec_dict, office_hot_water_dict)
-        dfs_new[agent_dict[key]] = output_per_block
-    
-    return dfs_new
+    # Generation loop. The agents are independent of each other (each has its own random seeds), so they are simulated
+    # concurrently. Threads rather than processes, since Polars and NumPy release the GIL for most of the work, and
+    # forking a process which uses Polars' thread pool is not safe.
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures: Dict[str, concurrent.futures.Future] = {}
+        for agent_dict in agent_dicts:
+            logger.info('Generating new data for ' + agent_dict[key])
+            futures[agent_dict[key]] = executor.submit(simulate, mock_data_constants, agent_dict, lazy_inputs,
+                                                       n_rows, model, output_per_actor.clone(), key,
+                                                       household_elec_z_hat)
+
+    return {agent_id: future.result() for agent_id, future in futures.items()}
 
 
 def simulate(mock_data_constants: Dict[str, Any], agent: dict, df_inputs: pl.LazyFrame, n_rows: int,
              model: RegressionResultsWrapper, output_per_actor: pl.DataFrame, key: str,
-             office_elec_dict: Dict[Tuple[int, int], float], office_hot_water_dict: Dict[Tuple[int, int], float]) \
-        -> pl.DataFrame:
+             household_elec_z_hat: Optional[np.ndarray] = None) -> pl.DataFrame:
     """
     Simulate mock data for agent and mock data constants.
+    df_inputs needs to contain the office columns added by add_office_daily_columns.
+    household_elec_z_hat can be passed in if already calculated, see predict_without_autoregression.
     """
     logger.debug('Starting work on \'{}\''.format(agent[key]))
         
@@ -281,15 +305,15 @@ def simulate(mock_data_constants: Dict[str, Any], agent: dict, df_inputs: pl.Laz
         office_atemp_m2 = agent['Atemp'] * fraction_office
 
         electricity_consumption.append(
-            simulate_office_based_on_daily(
+            simulate_office_based_on_hourly(
                 office_atemp_m2, mock_data_constants['RelativeErrorStdDev'],
-                mock_data_constants['OfficeElecKwhPerYearM2'], seed_office_heating,
-                df_inputs, n_rows, office_elec_dict))
+                mock_data_constants['OfficeElecKwhPerYearM2'], OFFICE_ELEC_RAW_COL, seed_office_heating,
+                df_inputs, n_rows))
 
-        office_hot_tap_water_cons = simulate_office_based_on_daily(
+        office_hot_tap_water_cons = simulate_office_based_on_hourly(
             office_atemp_m2, mock_data_constants['RelativeErrorStdDev'],
-            mock_data_constants['OfficeHotTapWaterKwhPerYearM2'], seed_office_heating,
-            df_inputs, n_rows, office_hot_water_dict)
+            mock_data_constants['OfficeHotTapWaterKwhPerYearM2'], OFFICE_HOT_WATER_RAW_COL, seed_office_heating,
+            df_inputs, n_rows)
         office_space_heating_cons = simulate_office_based_on_hourly(office_atemp_m2,
                                                                     mock_data_constants['RelativeErrorStdDev'],
                                                                     mock_data_constants['OfficeSpaceHeatKwhPerYearM2'],
@@ -311,7 +335,8 @@ def simulate(mock_data_constants: Dict[str, Any], agent: dict, df_inputs: pl.Laz
 
         household_el = simulate_household_electricity_aggregated(df_inputs, model, residential_atemp,
                                                                  seed_residential_electricity, n_rows,
-                                                                 mock_data_constants['HouseholdElecKwhPerYearM2Atemp'])
+                                                                 mock_data_constants['HouseholdElecKwhPerYearM2Atemp'],
+                                                                 household_elec_z_hat)
         property_el = property_electricity(df_inputs, residential_atemp, n_rows,
                                            mock_data_constants['ResidentialPropertyElecKwhPerYearM2Atemp'])
         electricity_consumption.append(add_datetime_value_frames([household_el, property_el]))
@@ -325,16 +350,17 @@ def simulate(mock_data_constants: Dict[str, Any], agent: dict, df_inputs: pl.Laz
         cooling_consumption.append(residential_cooling)
 
     logger.debug("Adding output for agent {}".format(agent[key]))
-    # Note: Here we join a normal DataFrame (output_per_actor) with LazyFrames
-    output_per_actor = output_per_actor. \
-        join(add_datetime_value_frames(electricity_consumption), on='datetime'). \
-        rename({'value': get_elec_cons_key(agent[key])}). \
-        join(add_datetime_value_frames(space_heating_consumption), on='datetime'). \
-        rename({'value': get_space_heat_cons_key(agent[key])}). \
-        join(add_datetime_value_frames(hot_tap_water_consumption), on='datetime'). \
-        rename({'value': get_hot_tap_water_cons_key(agent[key])}). \
-        join(add_datetime_value_frames(cooling_consumption), on='datetime'). \
-        rename({'value': get_cooling_cons_key(agent[key])})
+    # All the frames above are derived from df_inputs, so they have the same datetimes, in the same order, as
+    # output_per_actor. Hence no joins on 'datetime' are needed to assemble the output: Collect the four sums in one go
+    # (letting Polars run the query plans in parallel), then put their value columns side by side.
+    # The values are noisy mock data, so float32 is more than precise enough, and halves the size of what we store.
+    output_keys = [get_elec_cons_key(agent[key]), get_space_heat_cons_key(agent[key]),
+                   get_hot_tap_water_cons_key(agent[key]), get_cooling_cons_key(agent[key])]
+    summed = pl.collect_all([add_datetime_value_frames(frames).lazy() for frames in
+                             [electricity_consumption, space_heating_consumption, hot_tap_water_consumption,
+                              cooling_consumption]])
+    output_columns = [df['value'].cast(pl.Float32).alias(output_key) for df, output_key in zip(summed, output_keys)]
+    output_per_actor = pl.DataFrame([output_per_actor['datetime']] + output_columns)
 
     return output_per_actor
 
@@ -1,5 +1,5 @@
 import datetime
-from typing import List, Union
+from typing import List, Tuple, Union
 
 import numpy as np
 
@@ -9,7 +9,6 @@ import polars as pl
 
 import pytz
 
-from tradingplatformpoc.trading_platform_utils import nan_helper
 
 SWEDEN_TIMEZONE = pytz.timezone("Europe/Stockholm")
 # For the series which we take a pre-calculated value and add noise, this random noise will be piecewise linear, with
@@ -24,13 +23,36 @@ def scale_energy_consumption(unscaled_simulated_values_kwh: pl.LazyFrame, m2: fl
         # i.e. 365.25 days, with the wanted yearly sum.
         wanted_yearly_sum = m2 * kwh_per_year_per_m2
         return unscaled_simulated_values_kwh. \
-            with_row_count(). \
             select([pl.col('datetime'),
-                    pl.col('value') * wanted_yearly_sum / pl.col('value').where(pl.col('row_nr') < 8766).sum()])
+                    pl.col('value') * wanted_yearly_sum / pl.col('value').head(8766).sum()])
     else:
         raise RuntimeError("Less than a year's worth of data!")
 
 
+def get_scale_factor(unscaled_simulated_values_kwh: np.ndarray, m2: float, kwh_per_year_per_m2: float,
+                     n_rows: int) -> float:
+    """
+    The factor by which to multiply unscaled_simulated_values_kwh, to get the same result as scale_energy_consumption.
+    Useful when the values are already in a NumPy array, so the scaling can be done in the same pass as other
+    multiplications.
+    """
+    if n_rows >= 8760:
+        wanted_yearly_sum = m2 * kwh_per_year_per_m2
+        return wanted_yearly_sum / unscaled_simulated_values_kwh[:8766].sum()
+    else:
+        raise RuntimeError("Less than a year's worth of data!")
+
+
+def scaled_datetime_value_frame(datetimes: pl.Series, unscaled_simulated_values_kwh: np.ndarray, m2: float,
+                                kwh_per_year_per_m2: float, n_rows: int) -> pl.LazyFrame:
+    """
+    Same as scale_energy_consumption, for values which are already in a NumPy array: Scales them in place, and only
+    then wraps them, together with the datetimes, in a pl.LazyFrame.
+    """
+    unscaled_simulated_values_kwh *= get_scale_factor(unscaled_simulated_values_kwh, m2, kwh_per_year_per_m2, n_rows)
+    return pl.DataFrame([datetimes, pl.Series('value', unscaled_simulated_values_kwh)]).lazy()
+
+
 def add_datetime_value_frames(dfs: List[Union[pl.DataFrame, pl.LazyFrame]]) -> Union[pl.DataFrame, pl.LazyFrame]:
     """Works on both DataFrame and LazyFrame"""
     if len(dfs) == 1:
@@ -43,34 +65,44 @@ def add_datetime_value_frames(dfs: List[Union[pl.DataFrame, pl.LazyFrame]]) -> U
         return base_df
 
 
+# Major holidays will naturally have a big impact on household electricity usage patterns, with people not working
+# etc. Included here are: Christmas Eve, Christmas day, Boxing day, New years day, epiphany, 1 may, national day.
+# Some movable ones not included (Easter etc.)
+MAJOR_HOLIDAYS_SWEDEN = ((12, 24), (12, 25), (12, 26), (1, 1), (1, 6), (5, 1), (6, 6))
+# Day before Christmas Eve, New years eve, day before epiphany, Valborg, day before national day.
+DAYS_BEFORE_MAJOR_HOLIDAYS_SWEDEN = ((12, 23), (12, 31), (1, 5), (4, 30), (6, 5))
+
+
 def is_major_holiday_sweden(dt: datetime.datetime) -> bool:
     swedish_time = dt.astimezone(SWEDEN_TIMEZONE)
-    month_of_year = swedish_time.month
-    day_of_month = swedish_time.day
-    # Major holidays will naturally have a big impact on household electricity usage patterns, with people not working
-    # etc. Included here are: Christmas Eve, Christmas day, Boxing day, New years day, epiphany, 1 may, national day.
-    # Some movable ones not included (Easter etc.)
-    return ((month_of_year == 12) & (day_of_month == 24)) | \
-           ((month_of_year == 12) & (day_of_month == 25)) | \
-           ((month_of_year == 12) & (day_of_month == 26)) | \
-           ((month_of_year == 1) & (day_of_month == 1)) | \
-           ((month_of_year == 1) & (day_of_month == 6)) | \
-           ((month_of_year == 5) & (day_of_month == 1)) | \
-           ((month_of_year == 6) & (day_of_month == 6))
+    return (swedish_time.month, swedish_time.day) in MAJOR_HOLIDAYS_SWEDEN
 
 
 def is_day_before_major_holiday_sweden(dt: datetime.datetime) -> bool:
     swedish_time = dt.astimezone(SWEDEN_TIMEZONE)
-    month_of_year = swedish_time.month
-    day_of_month = swedish_time.day
-    # Major holidays will naturally have a big impact on household electricity usage patterns, with people not working
-    # etc. Included here are:
-    # Day before Christmas Eve, New years eve, day before epiphany, Valborg, day before national day.
-    return ((month_of_year == 12) & (day_of_month == 23)) | \
-           ((month_of_year == 12) & (day_of_month == 31)) | \
-           ((month_of_year == 1) & (day_of_month == 5)) | \
-           ((month_of_year == 4) & (day_of_month == 30)) | \
-           ((month_of_year == 6) & (day_of_month == 5))
+    return (swedish_time.month, swedish_time.day) in DAYS_BEFORE_MAJOR_HOLIDAYS_SWEDEN
+
+
+def _month_day_keys(months_and_days: Tuple[Tuple[int, int], ...]) -> np.ndarray:
+    return np.array([100 * month + day for month, day in months_and_days], dtype=np.int16)
+
+
+def get_major_holiday_flags(datetimes: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized version of is_major_holiday_sweden and is_day_before_major_holiday_sweden: Converts all rows to Swedish
+    time at once, and compares the (month, day) of each row with the (small) set of holidays.
+    Naive datetimes are taken to be in UTC.
+    @return: Two boolean arrays, the first for major holidays, the second for days before major holidays.
+    """
+    dt_index = pd.DatetimeIndex(datetimes)
+    if dt_index.tz is None:
+        dt_index = dt_index.tz_localize('UTC')
+    swedish_time = dt_index.tz_convert(SWEDEN_TIMEZONE)
+    # Small integers (at most 1231) are enough, and keep the temporary arrays small
+    month_and_day = 100 * swedish_time.month.to_numpy().astype(np.int16) + swedish_time.day.to_numpy().astype(np.int16)
+    is_major_holiday = np.isin(month_and_day, _month_day_keys(MAJOR_HOLIDAYS_SWEDEN))
+    is_pre_major_holiday = np.isin(month_and_day, _month_day_keys(DAYS_BEFORE_MAJOR_HOLIDAYS_SWEDEN))
+    return is_major_holiday, is_pre_major_holiday
 
 
 def extract_datetime_features_from_inputs_df(df_inputs: pd.DataFrame) -> pl.DataFrame:
@@ -87,10 +119,7 @@ def extract_datetime_features_from_inputs_df(df_inputs: pd.DataFrame) -> pl.Data
     df_inputs['day_of_week'] = df_inputs['datetime'].dt.dayofweek + 1
     df_inputs['day_of_month'] = df_inputs['datetime'].dt.day
     df_inputs['month_of_year'] = df_inputs['datetime'].dt.month
-    df_inputs['major_holiday'] = df_inputs['datetime']. \
-        apply(lambda dt: is_major_holiday_sweden(dt.to_pydatetime()))
-    df_inputs['pre_major_holiday'] = df_inputs['datetime']. \
-        apply(lambda dt: is_day_before_major_holiday_sweden(dt.to_pydatetime()))
+    df_inputs['major_holiday'], df_inputs['pre_major_holiday'] = get_major_holiday_flags(df_inputs['datetime'])
 
     return pl.from_pandas(df_inputs)
 
@@ -100,13 +129,15 @@ def constants(df_inputs: pl.LazyFrame, val: float) -> pl.LazyFrame:
 
 
 def get_noise(n_rows: int, random_seed: int, std_dev: float) -> np.ndarray:
+    """
+    Piecewise linear noise around 1, with knots every EVERY_X_HOURS hours. Returned as float32, since the noise is a
+    rough multiplicative factor, for which more precision is meaningless. The knots themselves are drawn in float64,
+    so that the random stream, and hence the noise for a given seed, is unchanged. Each call uses its own generator, so
+    calls are independent of each other and safe to run in parallel.
+    """
     every_xth = np.arange(0, n_rows, EVERY_X_HOURS)
     points_to_generate = len(every_xth)
     rng = np.random.default_rng(random_seed)
     generated_points = rng.normal(1, std_dev, points_to_generate)
-    noise = np.empty((n_rows,))
-    noise[:] = np.nan
-    noise[every_xth] = generated_points
-    nans, x = nan_helper(noise)
-    noise[nans] = np.interp(x(nans), x(~nans), noise[~nans])
-    return noise
+    # Linear interpolation between the knots, in one pass, without going via an array of NaNs
+    return np.interp(np.arange(n_rows), every_xth, generated_points).astype(np.float32)
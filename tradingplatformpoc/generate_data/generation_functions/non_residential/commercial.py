@@ -1,7 +1,9 @@
-import datetime
+import numpy as np
+
+import polars as pl
 
 from tradingplatformpoc.generate_data.generation_functions.non_residential.common import \
-    get_cooling_month_scaling_factor
+    COOLING_MONTH_SCALING_FACTORS
 
 COMMERCIAL_ELECTRICITY_CONSUMPTION_HOURLY_FACTOR = {
     0: 0.2,
@@ -31,19 +33,22 @@ COMMERCIAL_ELECTRICITY_CONSUMPTION_HOURLY_FACTOR = {
 }
 
 
-def get_commercial_electricity_consumption_hourly_factor(timestamp: datetime.datetime) -> float:
-    return COMMERCIAL_ELECTRICITY_CONSUMPTION_HOURLY_FACTOR[timestamp.hour]
+# Same as the above, but indexable by an array of hours
+COMMERCIAL_ELECTRICITY_CONSUMPTION_HOURLY_FACTORS = np.array([COMMERCIAL_ELECTRICITY_CONSUMPTION_HOURLY_FACTOR[hour]
+                                                              for hour in range(24)])
+
+
+def get_commercial_electricity_consumption_hourly_factor(datetimes: pl.Series) -> np.ndarray:
+    return COMMERCIAL_ELECTRICITY_CONSUMPTION_HOURLY_FACTORS[datetimes.dt.hour().to_numpy()]
 
 
-def get_commercial_heating_consumption_hourly_factor(timestamp: datetime.datetime) -> float:
+def get_commercial_heating_consumption_hourly_factor(datetimes: pl.Series) -> np.ndarray:
     """Assuming opening hours 9-20, roughly similar to COMMERCIAL_ELECTRICITY_CONSUMPTION_HOURLY_FACTOR"""
-    if 9 <= timestamp.hour < 20:
-        return 1.0
-    else:
-        return 0.5
+    hours = datetimes.dt.hour().to_numpy()
+    return np.where((9 <= hours) & (hours < 20), 1.0, 0.5)
 
 
-def get_commercial_cooling_consumption_factor(timestamp: datetime.datetime) -> float:
+def get_commercial_cooling_consumption_factor(datetimes: pl.Series) -> np.ndarray:
     """Returns a dimensionless scaling factor for cooling."""
-    return (get_cooling_month_scaling_factor(timestamp.month)
-            * COMMERCIAL_ELECTRICITY_CONSUMPTION_HOURLY_FACTOR[timestamp.hour])
+    return (COOLING_MONTH_SCALING_FACTORS[datetimes.dt.month().to_numpy()]
+            * COMMERCIAL_ELECTRICITY_CONSUMPTION_HOURLY_FACTORS[datetimes.dt.hour().to_numpy()])
@@ -1,11 +1,12 @@
-import datetime
 from typing import Any, Callable, Dict, Tuple
 
 import numpy as np
 
 import polars as pl
 
-from tradingplatformpoc.generate_data.generation_functions.common import scale_energy_consumption
+from scipy.special import expit
+
+from tradingplatformpoc.generate_data.generation_functions.common import constants, scaled_datetime_value_frame
 
 # Binomial model coefficients
 BM_INTERCEPT = 33.973192
@@ -17,113 +18,122 @@ LM_INTERCEPT = 26.030581
 LM_TEMP = -1.943567
 LM_STD_DEV = 3.8660184261891652
 
+# A time factor function takes a polars Series of datetimes, and returns the factor for each of them, as a NumPy array
+TimeFactorFunction = Callable[[pl.Series], np.ndarray]
+
 
 # Space heating model
 # ----------------------------------------------------------------------------------------------------------------------
 
 def inv_logit(p):
-    # Binomial GLM has the logit function as link
-    return np.exp(p) / (1 + np.exp(p))
+    # Binomial GLM has the logit function as link. expit doesn't overflow for large p, unlike exp(p) / (1 + exp(p))
+    return expit(p)
 
 
 def probability_of_0_space_heating(temperature: float) -> float:
+    return float(probability_of_0_space_heating_vec(np.array(temperature)))
+
+
+def probability_of_0_space_heating_vec(temperatures: np.ndarray) -> np.ndarray:
+    """Vectorized version of probability_of_0_space_heating."""
     # No observations of 0 energy where temperature is < 5.5. Therefore, to not get random 0s for much lower
     # temperatures than this, we'll artificially set heating to be non-zero whenever temperature < 5.5.
     # Also, no observations of >0 energy where temperature is > 18.7. Therefore, we set heating to be 0 whenever
     # temperature >= 20.
-    if temperature < 5.5:  # Changed from 5 since Andreas @ BDAB thought we had too many 0s during winter months
-        return 0.0
-    elif temperature >= 20:
-        return 1.0
-    else:
-        return 1.0 - inv_logit(BM_INTERCEPT
-                               + BM_TEMP_1 * min(max(temperature, 5.5), 8)
-                               + BM_TEMP_2 * min(max(temperature, 8), 12.5)
-                               + BM_TEMP_3 * max(temperature, 12.5))
+    # 5.5 changed from 5 since Andreas @ BDAB thought we had too many 0s during winter months
+    modelled = 1.0 - inv_logit(BM_INTERCEPT
+                               + BM_TEMP_1 * np.clip(temperatures, 5.5, 8)
+                               + BM_TEMP_2 * np.clip(temperatures, 8, 12.5)
+                               + BM_TEMP_3 * np.maximum(temperatures, 12.5))
+    return np.where(temperatures < 5.5, 0.0, np.where(temperatures >= 20, 1.0, modelled))
 
 
 def space_heating_given_more_than_0(temperature: float) -> float:
     """
     If we have concluded that the heating energy use is > 0, then we use this model to predict how much it will be.
     """
-    return max(0.0, LM_INTERCEPT + LM_TEMP * temperature)
+    return float(space_heating_given_more_than_0_vec(np.array(temperature)))
+
+
+def space_heating_given_more_than_0_vec(temperatures: np.ndarray) -> np.ndarray:
+    """Vectorized version of space_heating_given_more_than_0."""
+    return np.maximum(0.0, LM_INTERCEPT + LM_TEMP * temperatures)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
 
+def get_datetimes(input_df: pl.LazyFrame) -> pl.Series:
+    return input_df.select(pl.col('datetime')).collect()['datetime']
+
+
+def simulate_with_relative_errors(atemp_m2: float, random_seed: int, input_df: pl.LazyFrame,
+                                  kwh_per_year_per_m2: float, time_factor_function: TimeFactorFunction,
+                                  relative_error_std_dev: float, n_rows: int) -> pl.LazyFrame:
+    """
+    Gets a factor based on the time, multiplies it by a noise-factor, and scales it. All done in NumPy, wrapping the
+    result in a pl.LazyFrame only at the end.
+    """
+    if atemp_m2 == 0:
+        return constants(input_df, 0)
+
+    rng = np.random.default_rng(random_seed)
+    datetimes = get_datetimes(input_df)
+    unscaled_values = time_factor_function(datetimes) * (1 + rng.normal(0, relative_error_std_dev, n_rows))
+    return scaled_datetime_value_frame(datetimes, unscaled_values, atemp_m2, kwh_per_year_per_m2, n_rows)
+
+
 def simulate_hot_tap_water(school_atemp_m2: float, random_seed: int, input_df: pl.LazyFrame,
-                           space_heating_per_year_m2: float, time_factor_function: Callable,
+                           space_heating_per_year_m2: float, time_factor_function: TimeFactorFunction,
                            relative_error_std_dev: float, n_rows: int) -> pl.LazyFrame:
     """
     Gets a factor based on the hour of day, multiplies it by a noise-factor, and scales it. Parameter 'input_df'
     should be a pl.DataFrame with a column called 'datetime'.
     @return A pl.DataFrame with hot tap water load for the area, scaled to KWH_SPACE_HEATING_PER_YEAR_M2_SCHOOL.
     """
-    rng = np.random.default_rng(random_seed)
-
-    lf = input_df.select(pl.col('datetime')).with_column(
-        pl.col('datetime').apply(time_factor_function).alias('time_factors')
-    )
-
-    lf = lf.with_column(pl.Series(name='relative_errors',
-                                  values=rng.normal(0, relative_error_std_dev, n_rows)))
-    lf = lf.with_column(
-        (pl.col('time_factors') * (1 + pl.col('relative_errors'))).alias('unscaled_values')
-    )
-    # Evaluate the lazy data frame
-    lf = lf.select([pl.col('datetime'), pl.col('unscaled_values').alias('value')])
-
-    scaled_series = scale_energy_consumption(lf, school_atemp_m2,
-                                             space_heating_per_year_m2, n_rows)
-    return scaled_series
+    return simulate_with_relative_errors(school_atemp_m2, random_seed, input_df, space_heating_per_year_m2,
+                                         time_factor_function, relative_error_std_dev, n_rows)
 
 
 def simulate_space_heating(atemp_m2: float, random_seed: int,
                            lazy_inputs: pl.LazyFrame, space_heating_per_year_m2: float,
-                           time_factor_function: Callable, n_rows: int) -> pl.LazyFrame:
+                           time_factor_function: TimeFactorFunction, n_rows: int) -> pl.LazyFrame:
     """
     For more information, see "docs/Non-residential heating mock-up.md"
     @input input_df: A pl.DataFrame with a 'datetime' column and a 'temperature' column
     @return A pl.DataFrame with datetime and space heating load for the area, scaled to
         space_heating_per_year_m2.
     """
+    if atemp_m2 == 0:
+        return constants(lazy_inputs, 0)
+
     rng = np.random.default_rng(random_seed)
 
     # First calculate probability that there is 0 heating demand, then simulate.
     # Then, if heat demand non-zero, how much is it? Calculate expectancy then simulate
-    lf = lazy_inputs.select(
-        [pl.col('datetime'),
-         pl.when(
-             pl.col('temperature').
-             apply(lambda x: probability_of_0_space_heating(x)).
-             apply(lambda x: rng.binomial(n=1, p=1 - x)) == 1
-        ).then(
-             pl.col('temperature').
-             apply(lambda x: space_heating_given_more_than_0(x)).
-             apply(lambda x: np.maximum(0, rng.normal(loc=x, scale=LM_STD_DEV)))
-        ).otherwise(0).alias('sim_energy_unscaled_no_time_factor')
-        ]
-    )
+    temperatures = lazy_inputs.select(pl.col('temperature')).collect()['temperature'].to_numpy()
+    # Missing temperatures give 0 heating, without drawing any random numbers
+    is_known = ~np.isnan(temperatures)
+    known_temperatures = temperatures[is_known]
+    has_heating = rng.binomial(n=1, p=1 - probability_of_0_space_heating_vec(known_temperatures)) == 1
+    # Truncate at 0 and zero out the hours without heating in place, rather than allocating new arrays for each step
+    heating = rng.normal(loc=space_heating_given_more_than_0_vec(known_temperatures), scale=LM_STD_DEV)
+    np.maximum(heating, 0.0, out=heating)
+    heating *= has_heating
+    sim_energy = np.zeros(len(temperatures))
+    sim_energy[is_known] = heating
 
     # Adjust for opening times
-    lf = lf.with_column(
-        pl.col('datetime').apply(time_factor_function).alias('time_factors')
-    ).with_column(
-        (pl.col('sim_energy_unscaled_no_time_factor') * pl.col('time_factors')).alias('sim_energy_unscaled')
-    )
+    datetimes = get_datetimes(lazy_inputs)
+    sim_energy *= time_factor_function(datetimes)
 
     # Scale
-    scaled_df = scale_energy_consumption(lf.select([pl.col('datetime'), pl.col('sim_energy_unscaled').alias('value')]),
-                                         atemp_m2,
-                                         space_heating_per_year_m2, n_rows)
-
-    return scaled_df
+    return scaled_datetime_value_frame(datetimes, sim_energy, atemp_m2, space_heating_per_year_m2, n_rows)
 
 
 def simulate_area_electricity(atemp_m2: float, random_seed: int,
                               input_df: pl.LazyFrame, kwh_elec_per_yr_per_m2: float,
                               rel_error_std_dev: float,
-                              hourly_level_function: Callable[[datetime.datetime], float], n_rows: int) -> pl.LazyFrame:
+                              hourly_level_function: TimeFactorFunction, n_rows: int) -> pl.LazyFrame:
     """
     Simulates electricity demand for the given datetimes. Uses random_seed when generating random numbers.
     The total yearly amount is calculated using atemp_m2 and kwh_elec_per_yr_per_m2. Variability over time is
@@ -131,18 +141,8 @@ def simulate_area_electricity(atemp_m2: float, random_seed: int,
     For more information, see "docs/Non-residential electricity mock-up.md".
     @return A pl.DataFrame with datetimes and hourly electricity consumption, in kWh.
     """
-    rng = np.random.default_rng(random_seed)
-    lf = input_df.select(pl.col('datetime')).with_column(
-        pl.col('datetime').apply(hourly_level_function).alias('time_factors')
-    )
-    lf = lf.with_column(pl.Series(name='relative_errors',
-                                  values=rng.normal(0, rel_error_std_dev, n_rows)))
-    lf = lf.with_column(
-        (pl.col('time_factors') * (1 + pl.col('relative_errors'))).alias('unscaled_values')
-    )
-    lf = lf.select([pl.col('datetime'), pl.col('unscaled_values').alias('value')])
-    scaled_series = scale_energy_consumption(lf, atemp_m2, kwh_elec_per_yr_per_m2, n_rows)
-    return scaled_series
+    return simulate_with_relative_errors(atemp_m2, random_seed, input_df, kwh_elec_per_yr_per_m2,
+                                         hourly_level_function, rel_error_std_dev, n_rows)
 
 
 def get_cooling_month_scaling_factor(month: int) -> float:
@@ -164,8 +164,12 @@ def get_cooling_month_scaling_factor(month: int) -> float:
     return 0
 
 
+# Same as get_cooling_month_scaling_factor, but indexable by an array of months (index 0 is unused)
+COOLING_MONTH_SCALING_FACTORS = np.array([get_cooling_month_scaling_factor(month) for month in range(13)])
+
+
 def simulate_heating(mock_data_constants: Dict[str, Any], atemp_m2: float, space_heat_constant_name: str,
-                     hot_water_constant_name: str, time_factor_function: Callable, random_seed: int,
+                     hot_water_constant_name: str, time_factor_function: TimeFactorFunction, random_seed: int,
                      input_df: pl.LazyFrame, n_rows: int) -> Tuple[pl.LazyFrame, pl.LazyFrame]:
     """
     For more information, see "docs/Non-residential heating mock-up.md".
@@ -187,15 +191,8 @@ def simulate_heating(mock_data_constants: Dict[str, Any], atemp_m2: float, space
 
 
 def simulate_cooling(atemp_m2: float, kwh_cooling_per_yr_per_m2: float,
-                     rel_error_std_dev: float, time_factor_function: Callable,
+                     rel_error_std_dev: float, time_factor_function: TimeFactorFunction,
                      random_seed: int, input_df: pl.LazyFrame, n_rows: int) \
         -> pl.LazyFrame:
-    rng = np.random.default_rng(random_seed)
-    lf = input_df.select(
-        [pl.col('datetime'), pl.col('datetime').apply(time_factor_function).alias('time_factors')])
-    lf = lf.with_column(pl.Series(name='relative_errors',
-                                  values=rng.normal(0, rel_error_std_dev, n_rows)))
-    lf = lf.with_column(
-        (pl.col('time_factors') * (1 + pl.col('relative_errors'))).alias('value')
-    )
-    return scale_energy_consumption(lf, atemp_m2, kwh_cooling_per_yr_per_m2, n_rows)
+    return simulate_with_relative_errors(atemp_m2, random_seed, input_df, kwh_cooling_per_yr_per_m2,
+                                         time_factor_function, rel_error_std_dev, n_rows)
@@ -1,61 +1,104 @@
-import datetime
+import functools
 from typing import Dict, Tuple
 
-import pandas as pd
+import numpy as np
 
 from pkg_resources import resource_filename
 
 import polars as pl
 
 from tradingplatformpoc.generate_data.generation_functions.common import constants, get_noise, \
-    is_day_before_major_holiday_sweden, is_major_holiday_sweden, scale_energy_consumption
+    scaled_datetime_value_frame
+
+OFFICE_ELEC_RAW_COL = 'office_elec_raw'
+OFFICE_HOT_WATER_RAW_COL = 'office_hot_water_raw'
 
 
 def simulate_office_based_on_hourly(atemp_m2: float, std_dev: float, scale_factor: float, col_name: str,
                                     random_seed: int, df_inputs: pl.LazyFrame, n_rows: int) -> pl.LazyFrame:
     """
     Similarly to simulate_residential_total_heating, this method uses a column in df_inputs and adds some noise.
+    The unscaled values are computed in float32: they are noisy estimates, to be scaled by atemp_m2 and scale_factor,
+    so precision beyond ~1e-4 is meaningless, and float32 halves the memory used.
     """
     if atemp_m2 == 0:
         return constants(df_inputs, 0)
 
     noise = get_noise(n_rows, random_seed, std_dev)
 
-    energy_unscaled = df_inputs.select([pl.col('datetime'), pl.col(col_name).alias('value') * noise])
+    # Multiply as contiguous NumPy arrays, rather than passing the noise array into a Polars expression
+    inputs = df_inputs.select([pl.col('datetime'), pl.col(col_name)]).collect()
+    values = inputs[col_name].to_numpy().astype(np.float32) * noise
 
-    # Scale
-    return scale_energy_consumption(energy_unscaled, atemp_m2, scale_factor, n_rows)
+    # Scale, in place
+    return scaled_datetime_value_frame(inputs['datetime'], values, atemp_m2, scale_factor, n_rows)
 
 
-def simulate_office_based_on_daily(atemp_m2: float, std_dev: float, scale_factor: float, random_seed: int,
-                                   lazy_inputs: pl.LazyFrame, n_rows: int,
-                                   per_month_and_hour: Dict[Tuple[int, int], float]) -> pl.LazyFrame:
-    # First, add in the raw values from BDAB
-    lf = lazy_inputs.with_column(
-        pl.col('datetime').apply(lambda d: get_value_for_month_and_hour(d, per_month_and_hour)).alias('raw')
-    )
-    return simulate_office_based_on_hourly(atemp_m2, std_dev, scale_factor, 'raw', random_seed, lf, n_rows)
+def add_office_daily_columns(lazy_inputs: pl.LazyFrame, office_elec_table: np.ndarray,
+                             office_hot_water_table: np.ndarray) -> pl.LazyFrame:
+    """
+    Adds the raw values from BDAB, for electricity and hot water, as columns OFFICE_ELEC_RAW_COL and
+    OFFICE_HOT_WATER_RAW_COL. These don't depend on the agent, so this can be done once for all agents, which are then
+    simulated with simulate_office_based_on_hourly on these columns.
+    lazy_inputs needs to contain the date/time-related columns added by extract_datetime_features_from_inputs_df.
+    """
+    lf = add_values_for_month_and_hour(lazy_inputs, office_elec_table, OFFICE_ELEC_RAW_COL)
+    return add_values_for_month_and_hour(lf, office_hot_water_table, OFFICE_HOT_WATER_RAW_COL)
 
 
-def get_value_for_month_and_hour(d: datetime.datetime, per_month_and_hour: Dict[Tuple[int, int], float]):
+def add_values_for_month_and_hour(lf: pl.LazyFrame, per_month_and_hour: np.ndarray, col_name: str) -> pl.LazyFrame:
     """
-    The values in the dict are for Mon-Fri. We need to check if it is a weekend, or a public holiday - if so, we use the
-    "inactive" value, taken to be the value for hour = 0, for the whole day.
+    The values in the (13, 24) array, indexed by month and hour, are for Mon-Fri. We need to check if it is a weekend,
+    or a public holiday - if so, we use the "inactive" value, taken to be the value for hour = 0, for the whole day.
+    The array is turned into a small lookup table, indexed by month and an "offset": 0 for inactive days, and hour + 1
+    otherwise. This lookup table is joined on, and the value is added as a column named col_name. The month, hour,
+    weekday and holiday columns created by extract_datetime_features_from_inputs_df are used, so that these aren't
+    re-computed here.
     """
-    if is_major_holiday_sweden(d) or is_day_before_major_holiday_sweden(d) or d.weekday() >= 5:
-        return per_month_and_hour[(d.month, 0)]
-    return per_month_and_hour[(d.month, d.hour)]
+    # Column 0 holds the inactive value, columns 1-24 the values for hours 0-23
+    month_and_offset_table = np.hstack([per_month_and_hour[:, :1], per_month_and_hour])
+    months, offsets = np.indices(month_and_offset_table.shape)
+    lookup = pl.DataFrame({'month': months.ravel(), 'offset': offsets.ravel(),
+                           col_name: month_and_offset_table.ravel()})
+    # 'day_of_week' and 'hour_of_day' are 1-indexed, so for active days, 'hour_of_day' is exactly the offset we want
+    is_active = ~(pl.col('major_holiday') | pl.col('pre_major_holiday') | (pl.col('day_of_week') >= 6))
+    return lf.with_columns([
+        pl.col('month_of_year').cast(pl.Int64).alias('month'),
+        (pl.col('hour_of_day').cast(pl.Int64) * is_active.cast(pl.Int64)).alias('offset')
+    ]).join(lookup.lazy(), on=['month', 'offset'], how='left').drop(['month', 'offset'])
+
+
+@functools.lru_cache(maxsize=1)
+def read_office_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    From the 'office_days.csv' file, this function constructs two (13, 24) arrays (the first for electricity, the second
+    for hot water), with a value for energy consumption indexed by month (1-12, row 0 is unused) and hour of day.
+    The file is static, so the result is cached, and the arrays are made read-only.
+    """
+    df = pl.read_csv(resource_filename('tradingplatformpoc.data', 'office_days.csv'), sep=';', has_header=False,
+                     skip_rows=1, new_columns=['month', 'hour', 'elec_1', 'elec_2', 'hot_water'])
+    df = df.select([pl.col('month').fill_null(strategy='forward'),
+                    pl.col('hour'),
+                    (pl.col('elec_1') + pl.col('elec_2')).alias('elec'),
+                    pl.col('hot_water')])
+    months = df['month'].to_numpy()
+    hours = df['hour'].to_numpy()
+    elec = np.zeros((13, 24))
+    elec[months, hours] = df['elec'].to_numpy()
+    hot_water = np.zeros((13, 24))
+    hot_water[months, hours] = df['hot_water'].to_numpy()
+    elec.flags.writeable = False
+    hot_water.flags.writeable = False
+    return elec, hot_water
 
 
 def read_office_dicts() -> Tuple[Dict[Tuple[int, int], float], Dict[Tuple[int, int], float]]:
     """
-    From the 'office_days.csv' file, this function constructs dicts (the first for electricity, the second for hot
-    water), with a value for energy consumption based on the month and hour of day.
+    Same data as read_office_tables, but as dicts with (month, hour) keys.
     """
-    df = pd.read_csv(resource_filename('tradingplatformpoc.data', 'office_days.csv'), sep=';',
-                     names=['month', 'hour', 'elec_1', 'elec_2', 'hot_water'], skiprows=1)
-    df['month'] = df['month'].fillna(method='ffill').astype(int)
-    df = df.set_index(['month', 'hour'])
-    df['elec'] = df['elec_1'] + df['elec_2']
-    df.drop(['elec_1', 'elec_2'], axis=1, inplace=True)
-    return df['elec'].to_dict(), df['hot_water'].to_dict()
+    elec, hot_water = read_office_tables()
+    return table_to_dict(elec), table_to_dict(hot_water)
+
+
+def table_to_dict(table: np.ndarray) -> Dict[Tuple[int, int], float]:
+    return {(month, hour): float(table[month, hour]) for month in range(1, 13) for hour in range(24)}
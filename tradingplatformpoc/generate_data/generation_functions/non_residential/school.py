@@ -1,5 +1,9 @@
 import datetime
 
+import numpy as np
+
+import polars as pl
+
 
 def get_monday_of_week(year: int, week_number: int) -> datetime.datetime:
     return datetime.datetime.strptime(str(year) + '-W' + str(week_number) + '-1', "%Y-W%W-%w")
@@ -28,33 +32,26 @@ EASTER_START = get_monday_of_week(JUST_SOME_NONE_LEAP_YEAR, 15).timetuple().tm_y
 EASTER_END = EASTER_START + 8
 
 
-def is_break(timestamp: datetime.datetime):
-    # We compare the day-of-year to some pre-defined starts and ends of break periods
-    day_of_year = timestamp.timetuple().tm_yday
+BREAKS = ((SUMMER_START, SUMMER_END), (FALL_START, FALL_END), (CHRISTMAS_START, CHRISTMAS_END),
+          (SPRING_START, SPRING_END), (EASTER_START, EASTER_END))
 
-    # Return true if timestamp falls on break, false if not
-    if SUMMER_START <= day_of_year <= SUMMER_END:
-        return True
+# Opening hours 8-17:00 on weekdays, as a lookup table indexed by weekday (Monday = 0) * 24 + hour
+OPEN_BY_WEEKDAY_AND_HOUR = np.array([weekday < 5 and 8 <= hour < 17 for weekday in range(7) for hour in range(24)])
 
-    if FALL_START <= day_of_year <= FALL_END:
-        return True
 
-    if CHRISTMAS_START <= day_of_year <= CHRISTMAS_END:
-        return True
+def is_break(timestamp: datetime.datetime) -> bool:
+    # We compare the day-of-year to some pre-defined starts and ends of break periods
+    day_of_year = timestamp.timetuple().tm_yday
+    return any(start <= day_of_year <= end for start, end in BREAKS)
 
-    if SPRING_START <= day_of_year <= SPRING_END:
-        return True
 
-    if EASTER_START <= day_of_year <= EASTER_END:
-        return True
+def is_break_on_days(days_of_year: np.ndarray) -> np.ndarray:
+    """Vectorized version of is_break, taking an array of days-of-year."""
+    return np.logical_or.reduce([(start <= days_of_year) & (days_of_year <= end) for start, end in BREAKS])
 
 
-def get_school_heating_consumption_hourly_factor(timestamp: datetime.datetime) -> float:
+def get_school_heating_consumption_hourly_factor(datetimes: pl.Series) -> np.ndarray:
     """Assuming opening hours 8-17:00 except for weekends and breaks"""
-    if timestamp.weekday() == 5 or timestamp.weekday() == 6:  # Saturday or sunday
-        return 0.5
-    if is_break(timestamp):
-        return 0.5
-    if not (8 <= timestamp.hour < 17):
-        return 0.5
-    return 1
+    weekday_hours = datetimes.dt.weekday().to_numpy().astype(np.int64) * 24 + datetimes.dt.hour().to_numpy()
+    is_open = OPEN_BY_WEEKDAY_AND_HOUR[weekday_hours] & ~is_break_on_days(datetimes.dt.ordinal_day().to_numpy())
+    return np.where(is_open, 1.0, 0.5)
@@ -20,10 +20,12 @@ def simulate_residential_total_heating(mock_data_constants: Dict[str, Any], df_i
         zeroes = constants(df_inputs, 0)
         return zeroes, zeroes
 
-    noise = get_noise(n_rows, random_seed, mock_data_constants['RelativeErrorStdDev'])
+    # Add the noise as a single-chunk column, rather than passing a raw array into each expression
+    noise = pl.Series(name='noise', values=get_noise(n_rows, random_seed, mock_data_constants['RelativeErrorStdDev']))
+    lf = df_inputs.with_columns([noise])
 
-    space_heating_unscaled = df_inputs.select([pl.col('datetime'), pl.col('rad_energy').alias('value') * noise])
-    hot_tap_water_unscaled = df_inputs.select([pl.col('datetime'), pl.col('hw_energy').alias('value') * noise])
+    space_heating_unscaled = lf.select([pl.col('datetime'), (pl.col('rad_energy') * pl.col('noise')).alias('value')])
+    hot_tap_water_unscaled = lf.select([pl.col('datetime'), (pl.col('hw_energy') * pl.col('noise')).alias('value')])
     # Could argue we should use different noise here ^, but there is some logic to these two varying together
 
     # Scale
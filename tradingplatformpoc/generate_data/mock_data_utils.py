@@ -1,11 +1,12 @@
 import functools
 import hashlib
 import logging
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import polars as pl
 
-from tradingplatformpoc.sql.mock_data.crud import check_if_agent_equivalent_in_db, db_to_mock_data_df
+from tradingplatformpoc.sql.mock_data.crud import check_if_agent_equivalent_in_db, db_to_mock_data_df, \
+    get_relevant_agent_config
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +45,18 @@ def join_list_of_polar_dfs(dfs: List[pl.DataFrame]) -> pl.DataFrame:
         return pl.DataFrame()
 
 
+def join_list_of_polar_dfs_with_same_datetimes(dfs: List[pl.DataFrame]) -> pl.DataFrame:
+    """
+    Like join_list_of_polar_dfs, but for DataFrames whose 'datetime' columns are identical (same values, same order),
+    such as those from simulate_for_agents. Then no join is needed: All value columns are gathered into one DataFrame
+    at once, instead of copying a growing DataFrame once per agent.
+    """
+    if len(dfs) == 0:
+        logger.info('No DataFrames to join!')
+        return pl.DataFrame()
+    return pl.DataFrame([dfs[0]['datetime']] + [series for df in dfs for series in df.drop('datetime')])
+
+
 def get_equivalent_mock_data(mock_data_id: str, old_agent_id: str, new_agent_id: str) -> pl.DataFrame:
     """
     Gets the specified mock data pl.DataFrame by mock_data_id. The column names will include old_agent_id, which will
@@ -72,8 +85,14 @@ def get_mock_ids_to_reuse(block_agents_not_pre_existing: List[Dict[str, Any]], m
     """
     mock_id_to_reuse_for_agent_id: Dict[str, Dict[str, str]] = {}
     if reuse:
+        # Agents with the same relevant config have the same equivalents, so only query the database once for each
+        equivalents_per_relevant_config: Dict[str, Optional[Dict[str, str]]] = {}
         for block_agent in block_agents_not_pre_existing:
-            equivalents = check_if_agent_equivalent_in_db(block_agent, mock_data_constants)
+            relevant_config = str(sorted(get_relevant_agent_config(block_agent).items()))
+            if relevant_config not in equivalents_per_relevant_config:
+                equivalents_per_relevant_config[relevant_config] = \
+                    check_if_agent_equivalent_in_db(block_agent, mock_data_constants)
+            equivalents = equivalents_per_relevant_config[relevant_config]
             if equivalents is not None:
                 mock_id_to_reuse_for_agent_id[block_agent['db_id']] = equivalents
     return mock_id_to_reuse_for_agent_id
@@ -83,8 +102,8 @@ def calculate_seed_from_string(some_string: str) -> int:
     """
     Hashes the string, and truncates the value to a 32-bit integer, since that is what seeds are allowed to be.
     __hash__() is non-deterministic, so we use hashlib.
+    The last 4 bytes of the digest are the lowest 32 bits of the hash, read as a big-endian integer, so we take those
+    directly rather than converting the whole digest to a hexadecimal string and then to a 256-bit integer.
     """
     bytes_to_hash = some_string.encode('utf-8')
-    hashed_hexadecimal = hashlib.sha256(bytes_to_hash).hexdigest()
-    very_big_int = int(hashed_hexadecimal, 16)
-    return very_big_int & 0xFFFFFFFF
+    return int.from_bytes(hashlib.sha256(bytes_to_hash).digest()[-4:], 'big')
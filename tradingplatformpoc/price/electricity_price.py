@@ -5,7 +5,7 @@ from typing import List, Optional, Union
 import pandas as pd
 
 from tradingplatformpoc.market.trade import Market, Resource
-from tradingplatformpoc.price.iprice import IPrice, get_days_in_month
+from tradingplatformpoc.price.iprice import IPrice, get_days_in_month, get_previous_month, get_values_for_month
 
 logger = logging.getLogger(__name__)
 
@@ -103,9 +103,8 @@ class ElectricityPrice(IPrice):
             # Early in the month, we'll also use last month's values, so that we don't underestimate.
             # We will scale those values a bit though, so that we don't overestimate.
             scale_factor_for_last_month = 0.8
-            prev_month = period - datetime.timedelta(days=at_least_n_days + 1)
-            top_3_last_month = calculate_top_three_hourly_outtakes_for_month(sells_series,
-                                                                             prev_month.year, prev_month.month)
+            top_3_last_month = calculate_top_three_hourly_outtakes_for_month(
+                sells_series, *get_previous_month(period.year, period.month))
             scaled_last_month = [value * scale_factor_for_last_month for value in top_3_last_month]
             # Combine the lists
             combined_values = top_3_this_month + scaled_last_month
@@ -124,16 +123,14 @@ def calculate_top_three_hourly_outtakes_for_month(dt_series: pd.Series, year: in
     iven a series with a DatetimeIndex and numerical values, calculate the top 3 hourly outtakes for the given month.
     Used in Göteborg Energi's pricing model to calculate the effect fee.
     """
-    subset = (dt_series.index.year == year) & (dt_series.index.month == month)
-    return dt_series[subset].nlargest(3).values.tolist()
+    return get_values_for_month(dt_series, year, month).nlargest(3).values.tolist()
 
 
 def calculate_total_for_month(dt_series: pd.Series, year: int, month: int) -> float:
     """
     Given a series with a DatetimeIndex and numerical values, calculate the total for the given month.
     """
-    subset = (dt_series.index.year == year) & (dt_series.index.month == month)
-    return dt_series[subset].sum()
+    return get_values_for_month(dt_series, year, month).sum()
 
 
 def get_value_for_period(dt_series: pd.Series, dt: datetime.datetime) -> float:
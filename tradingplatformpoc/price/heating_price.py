@@ -1,17 +1,21 @@
 import datetime
 import logging
 from calendar import isleap
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 
 import pandas as pd
 
 from tradingplatformpoc.market.trade import Resource
-from tradingplatformpoc.price.iprice import IPrice, get_days_in_month
+from tradingplatformpoc.price.iprice import IPrice, get_days_in_month, get_previous_month, get_values_between, \
+    get_values_for_month
 
 logger = logging.getLogger(__name__)
 
+# 'Summer price' during May-September, 'Winter price' other months. Indexed by month of year, so index 0 is unused.
+IS_SUMMER_MONTH = (False, False, False, False, False, True, True, True, True, True, False, False, False)
+
 
 def handle_no_consumption_when_calculating_heating_price(period):
     logger.debug("Tried to calculate exact external heating price, in SEK/kWh, for {:%B %Y}, but had no "
@@ -27,6 +31,10 @@ class HeatingPrice(IPrice):
     """
 
     heating_wholesale_price_fraction: float
+    # The exact price only depends on the year and month, so it is cached by (agent, year, month), together with the
+    # sells series it was calculated from. When more sells are added, get_sells returns a new series, so the cached
+    # price won't be used.
+    exact_retail_price_cache: Dict[Tuple[Optional[str], int, int], Tuple[pd.Series, float]]
 
     GRID_FEE_MARGINAL_SUB_50: int = 1116
     GRID_FEE_FIXED_SUB_50: int = 1152
@@ -38,6 +46,13 @@ class HeatingPrice(IPrice):
     GRID_FEE_FIXED_200_400: int = 18348
     GRID_FEE_MARGINAL_400_PLUS: int = 936
     GRID_FEE_FIXED_400_PLUS: int = 33696
+    # Upper limits (exclusive) of the grid fee brackets, in kW, and the fees for each bracket
+    GRID_FEE_BRACKET_LIMITS: np.ndarray = np.array([50, 100, 200, 400])
+    GRID_FEE_MARGINAL: np.ndarray = np.array([GRID_FEE_MARGINAL_SUB_50, GRID_FEE_MARGINAL_50_100,
+                                              GRID_FEE_MARGINAL_100_200, GRID_FEE_MARGINAL_200_400,
+                                              GRID_FEE_MARGINAL_400_PLUS])
+    GRID_FEE_FIXED: np.ndarray = np.array([GRID_FEE_FIXED_SUB_50, GRID_FEE_FIXED_50_100, GRID_FEE_FIXED_100_200,
+                                           GRID_FEE_FIXED_200_400, GRID_FEE_FIXED_400_PLUS])
     MARGINAL_PRICE_WINTER: float = 0.5
     MARGINAL_PRICE_SUMMER: float = 0.3
 
@@ -45,6 +60,7 @@ class HeatingPrice(IPrice):
         super().__init__(Resource.HIGH_TEMP_HEAT)
         self.heating_wholesale_price_fraction = heating_wholesale_price_fraction
         self.effect_fee = effect_fee
+        self.exact_retail_price_cache = {}
     
     def marginal_grid_fee_assuming_top_bracket(self, year: int) -> float:
         """
@@ -54,24 +70,22 @@ class HeatingPrice(IPrice):
         we always end up in the top bracket.
         More info at https://www.varbergenergi.se/foretag/tjanster/fjarrvarme/fjarrvarme-priser/
         """
-        hours_in_jan_feb = 1416 + (24 if isleap(year) else 0)
-        return self.GRID_FEE_MARGINAL_400_PLUS / hours_in_jan_feb
+        return self.GRID_FEE_MARGINAL_400_PLUS / get_hours_in_jan_feb(year)
     
     def get_base_marginal_price(self, month_of_year: int) -> float:
         """'Summer price' during May-September, 'Winter price' other months."""
-        if 5 <= month_of_year <= 9:
-            return self.MARGINAL_PRICE_SUMMER  # Cheaper in summer
-        else:
-            return self.MARGINAL_PRICE_WINTER
+        # Cheaper in summer
+        return self.MARGINAL_PRICE_SUMMER if IS_SUMMER_MONTH[month_of_year] else self.MARGINAL_PRICE_WINTER
 
     def get_retail_price_excl_effect_fee(self, period: datetime.datetime) -> float:
         """
         Returns the price at which the external grid operator is believed to be willing to sell energy, in SEK/kWh,
         while excluding the part which depends on peak usage. No tax included (district heating is not taxed).
         """
-        jan_feb_extra = self.marginal_grid_fee_assuming_top_bracket(period.year)
         base_marginal_price = self.get_base_marginal_price(period.month)
-        return base_marginal_price + (jan_feb_extra * (period.month <= 2))
+        if period.month > 2:
+            return base_marginal_price
+        return base_marginal_price + self.marginal_grid_fee_assuming_top_bracket(period.year)
     
     def exact_effect_fee(self, monthly_peak_day_avg_consumption_kw: float) -> float:
         """
@@ -82,16 +96,12 @@ class HeatingPrice(IPrice):
     
     def get_yearly_grid_fee(self, jan_feb_hourly_avg_consumption_kw: float) -> float:
         """Based on Jan-Feb average hourly heating use."""
-        if jan_feb_hourly_avg_consumption_kw < 50:
-            return self.GRID_FEE_FIXED_SUB_50 + self.GRID_FEE_MARGINAL_SUB_50 * jan_feb_hourly_avg_consumption_kw
-        elif jan_feb_hourly_avg_consumption_kw < 100:
-            return self.GRID_FEE_FIXED_50_100 + self.GRID_FEE_MARGINAL_50_100 * jan_feb_hourly_avg_consumption_kw
-        elif jan_feb_hourly_avg_consumption_kw < 200:
-            return self.GRID_FEE_FIXED_100_200 + self.GRID_FEE_MARGINAL_100_200 * jan_feb_hourly_avg_consumption_kw
-        elif jan_feb_hourly_avg_consumption_kw < 400:
-            return self.GRID_FEE_FIXED_200_400 + self.GRID_FEE_MARGINAL_200_400 * jan_feb_hourly_avg_consumption_kw
-        else:
-            return self.GRID_FEE_FIXED_400_PLUS + self.GRID_FEE_MARGINAL_400_PLUS * jan_feb_hourly_avg_consumption_kw
+        return float(self.get_yearly_grid_fee_vec(np.array(jan_feb_hourly_avg_consumption_kw)))
+
+    def get_yearly_grid_fee_vec(self, jan_feb_hourly_avg_consumption_kw: np.ndarray) -> np.ndarray:
+        """Vectorized version of get_yearly_grid_fee."""
+        bracket = np.searchsorted(self.GRID_FEE_BRACKET_LIMITS, jan_feb_hourly_avg_consumption_kw, side='right')
+        return self.GRID_FEE_FIXED[bracket] + self.GRID_FEE_MARGINAL[bracket] * jan_feb_hourly_avg_consumption_kw
 
     def get_grid_fee_for_month(self, jan_feb_hourly_avg_consumption_kw: float, year: int, month_of_year: int) -> float:
         """
@@ -132,6 +142,16 @@ class HeatingPrice(IPrice):
         """Returns the price at which the external grid operator is willing to sell energy, in SEK/kWh"""
         # District heating is not taxed
         sells_series = self.get_sells(agent)
+        cache_key = (agent, period.year, period.month)
+        if cache_key in self.exact_retail_price_cache:
+            cached_for_series, cached_price = self.exact_retail_price_cache[cache_key]
+            if cached_for_series is sells_series:
+                return cached_price
+        price = self.calculate_exact_retail_price(sells_series, period)
+        self.exact_retail_price_cache[cache_key] = (sells_series, price)
+        return price
+
+    def calculate_exact_retail_price(self, sells_series: pd.Series, period: datetime.datetime) -> float:
         consumption_this_month_kwh = calculate_consumption_this_month(sells_series, period.year, period.month)
         if consumption_this_month_kwh == 0:
             return handle_no_consumption_when_calculating_heating_price(period)
@@ -158,8 +178,8 @@ class HeatingPrice(IPrice):
             # Early in the month, we'll also use last month's value, so that we don't underestimate.
             # We will scale that value a bit though, so that we don't overestimate.
             scale_factor_for_last_month = 0.8
-            prev_month = period - datetime.timedelta(days=at_least_n_days + 1)
-            peak_last_month = calculate_peak_day_avg_cons_kw(sells_series, prev_month.year, prev_month.month)
+            peak_last_month = calculate_peak_day_avg_cons_kw(sells_series,
+                                                             *get_previous_month(period.year, period.month))
             scaled_last_month = peak_last_month * scale_factor_for_last_month
             # Return the maximum of this month's peak, and the (scaled) last month's peak
             avg_peak = max(peak_this_month, scaled_last_month)
@@ -173,13 +193,16 @@ class HeatingPrice(IPrice):
         return self.effect_fee / get_days_in_month(date_time.month, date_time.year)
 
 
+def get_hours_in_jan_feb(year: int) -> int:
+    return 1416 + (24 if isleap(year) else 0)
+
+
 def calculate_consumption_this_month(dt_series: pd.Series, year: int, month: int) -> float:
     """
     Calculate the sum of all external heating sells for the specified year-month combination.
     Returns a float with the unit kWh.
     """
-    subset = (dt_series.index.year == year) & (dt_series.index.month == month)
-    return sum(dt_series[subset])
+    return get_values_for_month(dt_series, year, month).sum()
 
 
 def calculate_jan_feb_avg_heating_sold(dt_series: pd.Series, period: datetime.datetime) -> float:
@@ -187,16 +210,19 @@ def calculate_jan_feb_avg_heating_sold(dt_series: pd.Series, period: datetime.da
     Calculates the average effect (in kW) of heating sold in the previous January-February.
     """
     year_we_are_interested_in = period.year - 1 if period.month <= 2 else period.year
-    subset = (dt_series.index.year == year_we_are_interested_in) & (dt_series.index.month <= 2)
-    if not any(subset):
+    jan_1st = pd.Timestamp(year_we_are_interested_in, 1, 1, tz=dt_series.index.tz)
+    jan_feb = get_values_between(dt_series, jan_1st, jan_1st + pd.offsets.MonthBegin(2))
+    if jan_feb.empty:
         logger.debug("No data to base grid fee on, will 'cheat' and use future data")
-        subset = (dt_series.index.month <= 2)
-    return dt_series[subset].mean()
+        return dt_series[dt_series.index.month <= 2].mean()
+    return jan_feb.mean()
 
 
 def calculate_peak_day_avg_cons_kw(dt_series: pd.Series, year: int, month: int) -> float:
-    subset = (dt_series.index.year == year) & (dt_series.index.month == month)
-    heating_sells_this_month = dt_series[subset].copy()
-    sold_by_day = heating_sells_this_month.groupby(heating_sells_this_month.index.day).sum()
+    heating_sells_this_month = get_values_for_month(dt_series, year, month)
+    if heating_sells_this_month.empty:
+        return np.nan
+    # Sells are non-negative, so days without any sells (which get 0 here) can't affect the maximum
+    sold_by_day = np.bincount(heating_sells_this_month.index.day, weights=heating_sells_this_month.to_numpy())
     peak_day_avg_consumption = sold_by_day.max() / 24
     return peak_day_avg_consumption
@@ -1,7 +1,7 @@
 import datetime
 from abc import ABC, abstractmethod
 from calendar import monthrange
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 
@@ -18,20 +18,25 @@ class IPrice(ABC):
     wholesale_offset: float
     tax: float  # SEK/kWh
     grid_fee: float  # SEK/kWh
-    all_external_sells: pd.Series
-    external_sells_by_agent: Dict[str, pd.Series]
-    price_estimates: pd.Series
-    price_estimates_by_agent: Dict[str, pd.Series]
+    # External sells and price estimates are collected in dicts, keyed by period, since they are added one period at a
+    # time, and adding to a pd.Series copies the whole series. The sells are converted to pd.Series when needed.
+    external_sells: Dict[datetime.datetime, float]
+    external_sells_by_agent: Dict[str, Dict[datetime.datetime, float]]
+    price_estimates: Dict[datetime.datetime, float]
+    price_estimates_by_agent: Dict[str, Dict[datetime.datetime, float]]
+    # Sells converted to pd.Series, by agent (None for all agents). Entries are removed when more sells are added.
+    sells_series_cache: Dict[Optional[str], pd.Series]
 
     def __init__(self, resource: Resource):
         self.resource = resource
         self.wholesale_offset = 0
         self.tax = 0
         self.grid_fee = 0
-        self.all_external_sells = EMPTY_DATETIME_INDEXED_SERIES.copy()
-        self.external_sells_by_agent: Dict[str, pd.Series] = {}
-        self.price_estimates = EMPTY_DATETIME_INDEXED_SERIES.copy()
-        self.price_estimates_by_agent: Dict[str, pd.Series] = {}
+        self.external_sells = {}
+        self.external_sells_by_agent = {}
+        self.price_estimates = {}
+        self.price_estimates_by_agent = {}
+        self.sells_series_cache = {}
 
     @abstractmethod
     def get_exact_retail_price(self, period: datetime.datetime, include_tax: bool, agent: Optional[str] = None) \
@@ -48,31 +53,31 @@ class IPrice(ABC):
         """
         We need this information to be able to calculate the exact cost.
         """
-        self.all_external_sells = add_to_series(self.all_external_sells, period, external_sell_quantity)
+        add_to_dict(self.external_sells, period, external_sell_quantity)
+        self.sells_series_cache.pop(None, None)
 
     def add_external_sell_for_agent(self, period: datetime.datetime, external_sell_quantity: float, agent_id: str):
         """
         We need this information to be able to calculate the exact cost.
         """
         if agent_id not in self.external_sells_by_agent.keys():
-            self.external_sells_by_agent[agent_id] = EMPTY_DATETIME_INDEXED_SERIES.copy()
-        self.external_sells_by_agent[agent_id] = add_to_series(
-            self.external_sells_by_agent[agent_id], period, external_sell_quantity)
+            self.external_sells_by_agent[agent_id] = {}
+        add_to_dict(self.external_sells_by_agent[agent_id], period, external_sell_quantity)
+        self.sells_series_cache.pop(agent_id, None)
 
     def add_price_estimate(self, period: datetime.datetime, price_estimate: float):
         """
         We need this information to be able to calculate cost corrections later.
         """
-        self.price_estimates = set_in_series(self.price_estimates, period, price_estimate)
+        set_in_dict(self.price_estimates, period, price_estimate)
 
     def add_price_estimate_for_agent(self, period: datetime.datetime, price_estimate: float, agent_id: str):
         """
         We need this information to be able to calculate cost corrections later.
         """
         if agent_id not in self.price_estimates_by_agent.keys():
-            self.price_estimates_by_agent[agent_id] = EMPTY_DATETIME_INDEXED_SERIES.copy()
-        self.price_estimates_by_agent[agent_id] = set_in_series(
-            self.price_estimates_by_agent[agent_id], period, price_estimate)
+            self.price_estimates_by_agent[agent_id] = {}
+        set_in_dict(self.price_estimates_by_agent[agent_id], period, price_estimate)
 
     def get_retail_price_estimate(self, period: datetime.datetime, agent: Optional[str]) \
             -> float:
@@ -82,38 +87,69 @@ class IPrice(ABC):
             return np.nan
         return self.price_estimates.get(period, np.nan)
 
+    @property
+    def all_external_sells(self) -> pd.Series:
+        return self.get_sells()
+
     def get_sells(self, agent: Optional[str] = None) -> pd.Series:
         if agent is not None:
-            if agent in self.external_sells_by_agent.keys():
-                return self.external_sells_by_agent[agent]
-            return EMPTY_DATETIME_INDEXED_SERIES.copy()
-        return self.all_external_sells
+            if agent not in self.external_sells_by_agent.keys():
+                return EMPTY_DATETIME_INDEXED_SERIES.copy()
+            sells = self.external_sells_by_agent[agent]
+        else:
+            sells = self.external_sells
+        if agent not in self.sells_series_cache:
+            self.sells_series_cache[agent] = dict_to_series(sells)
+        return self.sells_series_cache[agent]
 
 
 def get_days_in_month(month_of_year: int, year: int) -> int:
     return monthrange(year, month_of_year)[1]
 
 
-def add_to_series(dt_series: pd.Series, period: datetime.datetime, quantity: float) -> pd.Series:
+def get_previous_month(year: int, month: int) -> Tuple[int, int]:
+    """Returns the year and month of the month before the given one."""
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+def get_values_between(dt_series: pd.Series, start: pd.Timestamp, end: pd.Timestamp) -> pd.Series:
+    """
+    Get the part of a datetime-indexed series where start <= index < end.
+    External sells are added chronologically, so their index is sorted, and this can be done with binary search on it,
+    rather than by comparing every element of it. Falls back to a boolean mask if the index is not sorted.
+    """
+    index = dt_series.index
+    if not index.is_monotonic_increasing:
+        return dt_series[(index >= start) & (index < end)]
+    return dt_series.iloc[index.searchsorted(start):index.searchsorted(end)]
+
+
+def get_values_for_month(dt_series: pd.Series, year: int, month: int) -> pd.Series:
+    """Get the part of a datetime-indexed series that falls in the given year-month combination."""
+    start = pd.Timestamp(year, month, 1, tz=dt_series.index.tz)
+    return get_values_between(dt_series, start, start + pd.offsets.MonthBegin())
+
+
+def dict_to_series(dt_dict: Dict[datetime.datetime, float]) -> pd.Series:
+    """Convert a dict with datetimes as keys to a datetime-indexed series."""
+    if len(dt_dict) == 0:
+        return EMPTY_DATETIME_INDEXED_SERIES.copy()
+    return pd.Series(dt_dict, dtype=float)
+
+
+def add_to_dict(dt_dict: Dict[datetime.datetime, float], period: datetime.datetime, quantity: float):
     """
-    Add to a datetime-indexed series.
+    Add to a datetime-keyed dict.
     Note: When there is 0 heating sold, this still needs to be added as a value - if there are values "missing" in
-    self.all_external_heating_sells, then some methods will break (calculate_jan_feb_avg_heating_sold for example)
+    the external sells, then some methods will break (calculate_jan_feb_avg_heating_sold for example)
     """
-    if period in dt_series.index:
-        dt_series[period] = dt_series[period] + quantity
-    else:
-        to_add_in = pd.Series(quantity, index=[period])
-        dt_series = pd.concat([dt_series, to_add_in])
-    return dt_series
+    dt_dict[period] = dt_dict.get(period, 0.0) + quantity
 
 
-def set_in_series(dt_series: pd.Series, period: datetime.datetime, value: float) -> pd.Series:
+def set_in_dict(dt_dict: Dict[datetime.datetime, float], period: datetime.datetime, value: float):
     """
-    Set a value in a datetime-indexed series, raising an error if a value already exists.
+    Set a value in a datetime-keyed dict, raising an error if a value already exists.
     """
-    if period in dt_series.index:
+    if period in dt_dict:
         raise ValueError('Tried to overwrite value for period {}'.format(period))
-    to_add_in = pd.Series(value, index=[period])
-    dt_series = pd.concat([dt_series, to_add_in])
-    return dt_series
+    dt_dict[period] = value
@@ -35,6 +35,11 @@ class Settings(BaseSettings):
     GLPK_PATH: Optional[str] = os.getenv('GLPK_PATH')
     # Whether to run in "test mode", simulating only a few days of the year.
     NOT_FULL_YEAR: bool = os.getenv('NOT_FULL_YEAR', 'False').lower() in ('true', '1', 't')
+    # Optional stopping criteria for GLPK: relative MIP gap, and time limit in seconds. If unset, GLPK solves to
+    # optimality without a time limit.
+    GLPK_MIP_GAP: Optional[float] = float(os.environ['GLPK_MIP_GAP']) if 'GLPK_MIP_GAP' in os.environ else None
+    GLPK_TIME_LIMIT_S: Optional[int] = int(os.environ['GLPK_TIME_LIMIT_S']) if 'GLPK_TIME_LIMIT_S' in os.environ \
+        else None
 
 
 settings = Settings()
@@ -4,7 +4,8 @@ import pandas as pd
 import pyomo.environ as pyo
 from pyomo.opt import OptSolver, SolverResults
 
-from tradingplatformpoc.simulation_runner.chalmers.domain import CEMSError, PERC_OF_HT_COVERABLE_BY_LT
+from tradingplatformpoc.simulation_runner.chalmers.domain import CEMSError, PERC_OF_HT_COVERABLE_BY_LT, \
+    series_to_param_dict
 
 
 def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Series,
@@ -49,9 +50,9 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
     # Check the maximum cooling produced vs the cooling demand
     max_cooling_produced_for_1_hour = (heatpump_COP - 1) * heatpump_max_power if HP_Cproduct_active else \
         np.inf if borehole and month not in [6, 7, 8] else 0
-    too_big_cool_demand = cold_consumption.gt(max_cooling_produced_for_1_hour)
+    too_big_cool_demand = cold_consumption.to_numpy() > max_cooling_produced_for_1_hour
     if too_big_cool_demand.any():
-        problematic_hours = [i for i, x in enumerate(too_big_cool_demand) if x]
+        problematic_hours = np.flatnonzero(too_big_cool_demand).tolist()
         raise CEMSError(message='Unfillable cooling demand for agent',
                         agent_indices=[agent],
                         hour_indices=problematic_hours)
@@ -62,7 +63,7 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
     model.T = pyo.Set(initialize=range(int(trading_horizon)))  # index of time intervals
     # Parameters
     model.penalty = pyo.Param(initialize=1000)
-    model.nordpool_price = pyo.Param(model.T, initialize=nordpool_price)
+    model.nordpool_price = pyo.Param(model.T, initialize=series_to_param_dict(nordpool_price, trading_horizon))
     model.elec_peak_load_fee = pyo.Param(initialize=elec_peak_load_fee)
     model.elec_trans_fee = pyo.Param(initialize=elec_trans_fee)
     model.elec_tax_fee = pyo.Param(initialize=elec_tax_fee)
@@ -72,17 +73,21 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
     # Grid data
     model.Pmax_market = pyo.Param(initialize=max_elec_transfer_to_external)
     model.Hmax_market = pyo.Param(initialize=max_heat_transfer_to_external)
+    # Buying is always more expensive than selling if this holds, so buying and selling at the same time is never
+    # optimal, and no binary variable is needed to prevent it (which turns the problem into an LP)
+    model.market_binary_needed = pyo.Param(initialize=elec_trans_fee + elec_tax_fee <= incentive_fee)
     model.hist_top_three_elec_peak_load = pyo.Param(range(3), initialize={i: hist_top_three_elec_peak_load[i]
                                                                           for i in range(3)})
     model.Hist_monthly_heat_peak_energy = pyo.Param(initialize=hist_monthly_heat_peak_energy)
     # Demand data of agents
-    model.Pdem = pyo.Param(model.T, initialize=lambda m, t: elec_consumption.iloc[t])
-    model.Hhw = pyo.Param(model.T, initialize=lambda m, t: hot_water_heatdem.iloc[t])
-    model.Hsh = pyo.Param(model.T, initialize=lambda m, t: space_heating_heatdem.iloc[t])
-    model.Cld = pyo.Param(model.T, initialize=lambda m, t: cold_consumption.iloc[t])
+    model.Pdem = pyo.Param(model.T, initialize=series_to_param_dict(elec_consumption, trading_horizon))
+    model.Hhw = pyo.Param(model.T, initialize=series_to_param_dict(hot_water_heatdem, trading_horizon))
+    model.Hsh = pyo.Param(model.T, initialize=series_to_param_dict(space_heating_heatdem, trading_horizon))
+    model.Cld = pyo.Param(model.T, initialize=series_to_param_dict(cold_consumption, trading_horizon))
     # Supply data of agents
-    model.Ppv = pyo.Param(model.T, initialize=lambda m, t: pv_production.iloc[t])
-    model.Hsh_excess_high_temp = pyo.Param(model.T, initialize=lambda m, t: excess_high_temp_heat.iloc[t])
+    model.Ppv = pyo.Param(model.T, initialize=series_to_param_dict(pv_production, trading_horizon))
+    model.Hsh_excess_high_temp = pyo.Param(model.T,
+                                           initialize=series_to_param_dict(excess_high_temp_heat, trading_horizon))
     # BES data
     model.effe = pyo.Param(initialize=battery_efficiency)
     model.SOCBES0 = pyo.Param(initialize=SOCBES0)
@@ -117,27 +122,46 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
     # Local heat network efficiency
     model.Heat_trans_loss = pyo.Param(initialize=heat_trans_loss)
     # Variable
-    model.Pbuy_market = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Psell_market = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.U_power_buy_sell_market = pyo.Var(model.T, within=pyo.Binary, initialize=0)
-    model.Hbuy_market = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Pcha = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Pdis = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
+    # Limits that don't depend on other variables are given as bounds rather than as constraints, since the solver
+    # handles bounds much more efficiently than constraint rows
+    model.Pbuy_market = pyo.Var(model.T, bounds=(0, model.Pmax_market), within=pyo.NonNegativeReals, initialize=0)
+    model.Psell_market = pyo.Var(model.T, bounds=(0, model.Pmax_market), within=pyo.NonNegativeReals, initialize=0)
+    if model.market_binary_needed:
+        model.U_power_buy_sell_market = pyo.Var(model.T, within=pyo.Binary, initialize=0)
+    model.Hbuy_market = pyo.Var(model.T, bounds=(0, model.Hmax_market), within=pyo.NonNegativeReals, initialize=0)
+    # Maximum charging/discharging power limitations of the battery
+    model.Pcha = pyo.Var(model.T, bounds=(0, model.Pmax_BES_Cha), within=pyo.NonNegativeReals, initialize=0)
+    model.Pdis = pyo.Var(model.T, bounds=(0, model.Pmax_BES_Dis), within=pyo.NonNegativeReals, initialize=0)
     model.SOCBES = pyo.Var(model.T, bounds=(0, 1), within=pyo.NonNegativeReals,
                            initialize=lambda m, t: SOCBES0)
-    model.Hhp = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
+    model.Hhp = pyo.Var(model.T, bounds=(0, model.Hhpmax), within=pyo.NonNegativeReals, initialize=0)
     model.Chp = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Php = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.HTEScha = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.HTESdis = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
+    model.Php = pyo.Var(model.T, bounds=(0, model.Phpmax), within=pyo.NonNegativeReals, initialize=0)
+    # Maximum/minimum temperature limitations of hot water inside TES
+    model.HTEScha = pyo.Var(model.T, bounds=(0, model.kwh_per_deg * model.Tmax_TES), within=pyo.NonNegativeReals,
+                            initialize=0)
+    model.HTESdis = pyo.Var(model.T, bounds=(0, model.kwh_per_deg * model.Tmax_TES), within=pyo.NonNegativeReals,
+                            initialize=0)
     model.SOCTES = pyo.Var(model.T, bounds=(0, 1), within=pyo.NonNegativeReals,
                            initialize=lambda m, t: SOCTES0)
-    model.Energy_shallow = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
+    # Without storage capacity, the storage variables are constant. Fixing them means they are left out of the problem
+    # passed to the solver, while their values can still be read from the model afterwards.
+    if battery_capacity == 0:
+        model.Pcha.fix(0)
+        model.Pdis.fix(0)
+        model.SOCBES.fix(SOCBES0)
+    if kwh_per_deg == 0:
+        model.HTEScha.fix(0)
+        model.HTESdis.fix(0)
+        model.SOCTES.fix(SOCTES0)
+    model.Energy_shallow = pyo.Var(model.T, bounds=(0, model.Energy_shallow_cap), within=pyo.NonNegativeReals,
+                                   initialize=0)
     # Charge/discharge of the shallow layer, a negative value meaning discharge
     model.Hcha_shallow = pyo.Var(model.T, within=pyo.Reals, initialize=0)
     model.Flow = pyo.Var(model.T, within=pyo.Reals, initialize=0)
     model.Loss_shallow = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Energy_deep = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
+    model.Energy_deep = pyo.Var(model.T, bounds=(0, model.Energy_deep_cap), within=pyo.NonNegativeReals,
+                                initialize=0)
     model.Loss_deep = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
     # if summer_mode:
     #     model.HhpB = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
@@ -171,12 +195,10 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
     # Constraints:
     # Buying and selling heat/electricity from agents cannot happen at the same time
     # and should be restricted to its maximum value (Pmax_grid) (eqs. 10 to 15 of the report)
+    # The maximum values are variable bounds, these are only used when the binary variable is needed
     def max_Pbuy_market(model, t):
         return model.Pbuy_market[t] <= model.Pmax_market * model.U_power_buy_sell_market[t]
 
-    def max_Hbuy_market(model, t):
-        return model.Hbuy_market[t] <= model.Hmax_market  # * model.U_heat_buy_sell_market[i, t]
-
     def max_Psell_market(model, t):
         return model.Psell_market[t] <= model.Pmax_market * (1 - model.U_power_buy_sell_market[t])
 
@@ -296,12 +318,6 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
         return model.Flow[t] == ((model.Energy_shallow[t] / model.Energy_shallow_cap)
                                  - (model.Energy_deep[t] / model.Energy_deep_cap)) * model.Kval
 
-    def BITES_max_Eshallow(model, t):
-        return model.Energy_shallow[t] <= model.Energy_shallow_cap
-
-    def BITES_max_Edeep(model, t):
-        return model.Energy_deep[t] <= model.Energy_deep_cap
-
     def BITES_shallow_loss(model, t):
         if t == 0:
             return model.Loss_shallow[0] == 0
@@ -322,18 +338,12 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
         return model.Hcha_shallow[t] <= model.Hhpmax + model.Hmax_market - model.Hsh[t]
 
     # Battery energy storage model (eqs. 16 to 19 of the report)
-    # Maximum charging/discharging power limitations
-    def BES_max_dis(model, t):
-        return model.Pdis[t] <= model.Pmax_BES_Dis
-
-    def BES_max_cha(model, t):
-        return model.Pcha[t] <= model.Pmax_BES_Cha
-
+    # Maximum charging/discharging power limitations are variable bounds
     # State of charge modelling
     def BES_Ebalance(model, t):
         if model.Emax_BES == 0:
-            # No storage capacity, then we need to ensure that charge and discharge are 0 as well.
-            return model.Pcha[t] + model.Pdis[t] == model.Emax_BES
+            # No storage capacity, charge and discharge have been fixed to 0
+            return pyo.Constraint.Skip
         # We assume that model.effe cannot be 0
         if t == 0:
             charge = model.Pcha[0] * model.effe / model.Emax_BES
@@ -345,7 +355,9 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
             return model.SOCBES[t] == model.SOCBES[t - 1] + charge - discharge
 
     def BES_final_SOC(model):
-        return model.SOCBES[len(model.T) - 1] == model.SOCBES0
+        if model.Emax_BES == 0:
+            return pyo.Constraint.Skip
+        return model.SOCBES[model.T.last()] == model.SOCBES0
 
     def BES_remove_binaries(model, t):
         if (model.Pmax_BES_Dis == 0) or (model.Pmax_BES_Cha == 0):
@@ -364,12 +376,6 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
         else:
             return model.Chp[t] == 0
 
-    def max_HP_Hproduct(model, t):
-        return model.Hhp[t] <= model.Hhpmax
-
-    def max_HP_Pconsumption(model, t):
-        return model.Php[t] <= model.Phpmax
-
     # Booster heat pump model (eq. 20 of the report)
     # def booster_HP_Hproduct(model, t):
     #     # Only used in summer mode
@@ -380,18 +386,12 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
     #     return model.HhpB[t] <= model.HhpBmax
 
     # Thermal energy storage model (eqs. 32 to 25 of the report)
-    # Maximum/minimum temperature limitations of hot water inside TES
-    def max_HTES_dis(model, t):
-        return model.HTESdis[t] <= model.kwh_per_deg * model.Tmax_TES
-
-    def max_HTES_cha(model, t):
-        return model.HTEScha[t] <= model.kwh_per_deg * model.Tmax_TES
-
+    # Maximum/minimum temperature limitations of hot water inside TES are variable bounds
     # State of charge modelling
     def HTES_Ebalance(model, t):
         if model.kwh_per_deg == 0:
-            # No storage capacity, then we need to ensure that charge and discharge are 0 as well.
-            return model.HTESdis[t] + model.HTEScha[t] == model.kwh_per_deg
+            # No storage capacity, charge and discharge have been fixed to 0
+            return pyo.Constraint.Skip
         # We assume that model.efft and model.Tmax_TES cannot be 0
         charge = model.HTEScha[t] * model.efft / (model.kwh_per_deg * model.Tmax_TES)
         discharge = model.HTESdis[t] / ((model.kwh_per_deg * model.Tmax_TES) * model.efft)
@@ -402,12 +402,14 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
             return model.SOCTES[t] == model.SOCTES[t - 1] + charge_change
 
     def HTES_final_SOC(model):
-        return model.SOCTES[len(model.T) - 1] == model.SOCTES0
+        if model.kwh_per_deg == 0:
+            return pyo.Constraint.Skip
+        return model.SOCTES[model.T.last()] == model.SOCTES0
 
     model.obj = pyo.Objective(rule=obj_rule, sense=pyo.minimize)
-    model.con_max_Pbuy_market = pyo.Constraint(model.T, rule=max_Pbuy_market)
-    model.con_max_Hbuy_market = pyo.Constraint(model.T, rule=max_Hbuy_market)
-    model.con_max_Psell_market = pyo.Constraint(model.T, rule=max_Psell_market)
+    if model.market_binary_needed:
+        model.con_max_Pbuy_market = pyo.Constraint(model.T, rule=max_Pbuy_market)
+        model.con_max_Psell_market = pyo.Constraint(model.T, rule=max_Psell_market)
     model.con_elec_peak_load1 = pyo.Constraint(model.T, rule=elec_peak_load1)
     model.con_elec_peak_load2 = pyo.Constraint(rule=elec_peak_load2)
     model.con_elec_peak_load3 = pyo.Constraint(rule=elec_peak_load3)
@@ -439,19 +441,11 @@ def solve_model(solver: OptSolver, month: int, agent: int, nordpool_price: pd.Se
     model.con_BITES_deep_loss = pyo.Constraint(model.T, rule=BITES_deep_loss)
     model.con_BITES_max_Hdis_shallow = pyo.Constraint(model.T, rule=BITES_max_Hdis_shallow)
     model.con_BITES_max_Hcha_shallow = pyo.Constraint(model.T, rule=BITES_max_Hcha_shallow)
-    model.con_BITES_max_Eshallow = pyo.Constraint(model.T, rule=BITES_max_Eshallow)
-    model.con_BITES_max_Edeep = pyo.Constraint(model.T, rule=BITES_max_Edeep)
-    model.con_BES_max_dis = pyo.Constraint(model.T, rule=BES_max_dis)
-    model.con_BES_max_cha = pyo.Constraint(model.T, rule=BES_max_cha)
     model.con_BES_Ebalance = pyo.Constraint(model.T, rule=BES_Ebalance)
     model.con_BES_final_SOC = pyo.Constraint(rule=BES_final_SOC)
     model.con_BES_remove_binaries = pyo.Constraint(model.T, rule=BES_remove_binaries)
     model.con_HP_Hproduct = pyo.Constraint(model.T, rule=HP_Hproduct)
     model.con_HP_Cproduct = pyo.Constraint(model.T, rule=HP_Cproduct)
-    model.con_max_HP_Hproduct = pyo.Constraint(model.T, rule=max_HP_Hproduct)
-    model.con_max_HP_Pconsumption = pyo.Constraint(model.T, rule=max_HP_Pconsumption)
-    model.con_max_HTES_dis = pyo.Constraint(model.T, rule=max_HTES_dis)
-    model.con_max_HTES_cha = pyo.Constraint(model.T, rule=max_HTES_cha)
     model.con_HTES_Ebalance = pyo.Constraint(model.T, rule=HTES_Ebalance)
     model.con_HTES_final_SOC = pyo.Constraint(rule=HTES_final_SOC)
 
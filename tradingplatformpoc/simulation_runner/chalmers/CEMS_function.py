@@ -7,7 +7,8 @@ import pandas as pd
 import pyomo.environ as pyo
 from pyomo.opt import OptSolver, SolverResults
 
-from tradingplatformpoc.simulation_runner.chalmers.domain import CEMSError, PERC_OF_HT_COVERABLE_BY_LT
+from tradingplatformpoc.simulation_runner.chalmers.domain import CEMSError, PERC_OF_HT_COVERABLE_BY_LT, \
+    df_to_param_dict, series_to_param_dict
 
 
 def solve_model(solver: OptSolver, summer_mode: bool, month: int, n_agents: int, nordpool_price: pd.Series,
@@ -70,24 +71,27 @@ def solve_model(solver: OptSolver, summer_mode: bool, month: int, n_agents: int,
     # If the booster cannot cover this, we won't be able to find a solution (the TerminationCondition will be
     # 'infeasible'). Easier to raise this error straight away, so that the user knows specifically what went wrong.
     if summer_mode:
-        max_tank_dis = [x * y for x, y in zip(kwh_per_deg, thermalstorage_max_temp)]
-        must_be_covered_by_booster = hot_water_heatdem.sub(max_tank_dis, axis=0) * (1 - PERC_OF_HT_COVERABLE_BY_LT)
-        too_big_hot_water_demand = must_be_covered_by_booster.gt(booster_heatpump_max_heat, axis=0).any(axis=1)
-        if sum(too_big_hot_water_demand) > 0:
-            problematic_agent_indices = [i for i, x in enumerate(too_big_hot_water_demand) if x]
+        # Rows are agents, columns are hours
+        max_tank_dis = np.multiply(kwh_per_deg, thermalstorage_max_temp)[:, np.newaxis]
+        must_be_covered_by_booster = (hot_water_heatdem.to_numpy() - max_tank_dis) * (1 - PERC_OF_HT_COVERABLE_BY_LT)
+        too_big_hot_water_demand = (must_be_covered_by_booster
+                                    > np.asarray(booster_heatpump_max_heat)[:, np.newaxis]).any(axis=1)
+        if too_big_hot_water_demand.any():
+            problematic_agent_indices = np.flatnonzero(too_big_hot_water_demand).tolist()
             raise CEMSError(message='Unfillable hot water demand for agent(s)',
                             agent_indices=problematic_agent_indices,
                             hour_indices=[])
 
     # Similarly, check the maximum cooling produced vs the cooling demand
+    borehole_free_cooling = month not in [6, 7, 8]
     max_cooling_produced_for_1_hour = Pccmax * chiller_COP \
-                                      + sum([(hp_cop - 1) * max_php if hpc_active else
-                                             np.inf if has_bh and month not in [6, 7, 8] else 0
-                                             for hp_cop, max_php, hpc_active, has_bh in
-                                             zip(heatpump_COP, heatpump_max_power, HP_Cproduct_active, borehole)])
-    too_big_cool_demand = cold_consumption.sum(axis=0).gt(max_cooling_produced_for_1_hour)
+                                      + sum((hp_cop - 1) * max_php if hpc_active else
+                                            np.inf if has_bh and borehole_free_cooling else 0
+                                            for hp_cop, max_php, hpc_active, has_bh in
+                                            zip(heatpump_COP, heatpump_max_power, HP_Cproduct_active, borehole))
+    too_big_cool_demand = cold_consumption.to_numpy().sum(axis=0) > max_cooling_produced_for_1_hour
     if too_big_cool_demand.any():
-        problematic_hours = [i for i, x in enumerate(too_big_cool_demand) if x]
+        problematic_hours = np.flatnonzero(too_big_cool_demand).tolist()
         raise CEMSError(message='Unfillable cooling demand in LEC',
                         agent_indices=[],
                         hour_indices=problematic_hours)
@@ -98,7 +102,7 @@ def solve_model(solver: OptSolver, summer_mode: bool, month: int, n_agents: int,
     model.I = pyo.Set(initialize=range(int(n_agents)))  # index of agents
     # Parameters
     model.penalty = pyo.Param(initialize=1000)
-    model.nordpool_price = pyo.Param(model.T, initialize=nordpool_price)
+    model.nordpool_price = pyo.Param(model.T, initialize=series_to_param_dict(nordpool_price, trading_horizon))
     model.elec_peak_load_fee = pyo.Param(initialize=elec_peak_load_fee)
     model.elec_trans_fee = pyo.Param(initialize=elec_trans_fee)
     model.elec_tax_fee = pyo.Param(initialize=elec_tax_fee)
@@ -109,20 +113,24 @@ def solve_model(solver: OptSolver, summer_mode: bool, month: int, n_agents: int,
     model.Pmax_grid = pyo.Param(initialize=max_elec_transfer_between_agents)
     model.Hmax_grid = pyo.Param(initialize=max_heat_transfer_between_agents)
     model.Pmax_market = pyo.Param(initialize=max_elec_transfer_to_external)
+    # Buying is always more expensive than selling if this holds, so buying and selling at the same time is never
+    # optimal, and no binary variable is needed to prevent it
+    model.market_binary_needed = pyo.Param(initialize=elec_trans_fee + elec_tax_fee <= incentive_fee)
     model.Hmax_market = pyo.Param(initialize=max_heat_transfer_to_external)
     model.hist_top_three_elec_peak_load = pyo.Param(range(3), initialize={i: hist_top_three_elec_peak_load[i]
                                                                           for i in range(3)})
     model.Hist_monthly_heat_peak_energy = pyo.Param(initialize=hist_monthly_heat_peak_energy)
     # Demand data of agents
-    model.Pdem = pyo.Param(model.I, model.T, initialize=lambda m, i, t: elec_consumption.iloc[i, t])
-    model.Hhw = pyo.Param(model.I, model.T, initialize=lambda m, i, t: hot_water_heatdem.iloc[i, t])
-    model.Hsh = pyo.Param(model.I, model.T, initialize=lambda m, i, t: space_heating_heatdem.iloc[i, t])
-    model.Cld = pyo.Param(model.I, model.T, initialize=lambda m, i, t: cold_consumption.iloc[i, t])
+    model.Pdem = pyo.Param(model.I, model.T, initialize=df_to_param_dict(elec_consumption, trading_horizon))
+    model.Hhw = pyo.Param(model.I, model.T, initialize=df_to_param_dict(hot_water_heatdem, trading_horizon))
+    model.Hsh = pyo.Param(model.I, model.T, initialize=df_to_param_dict(space_heating_heatdem, trading_horizon))
+    model.Cld = pyo.Param(model.I, model.T, initialize=df_to_param_dict(cold_consumption, trading_horizon))
     # Supply data of agents
-    model.Ppv = pyo.Param(model.I, model.T, initialize=lambda m, i, t: pv_production.iloc[i, t])
-    model.Hsh_excess_low_temp = pyo.Param(model.I, model.T, initialize=lambda m, i, t: excess_low_temp_heat.iloc[i, t])
+    model.Ppv = pyo.Param(model.I, model.T, initialize=df_to_param_dict(pv_production, trading_horizon))
+    model.Hsh_excess_low_temp = pyo.Param(model.I, model.T,
+                                          initialize=df_to_param_dict(excess_low_temp_heat, trading_horizon))
     model.Hsh_excess_high_temp = pyo.Param(model.I, model.T,
-                                           initialize=lambda m, i, t: excess_high_temp_heat.iloc[i, t])
+                                           initialize=df_to_param_dict(excess_high_temp_heat, trading_horizon))
     # BES data
     model.effe = pyo.Param(initialize=battery_efficiency)
     model.SOCBES0 = pyo.Param(model.I, initialize=SOCBES0)
@@ -162,40 +170,63 @@ def solve_model(solver: OptSolver, summer_mode: bool, month: int, n_agents: int,
     model.Heat_trans_loss = pyo.Param(initialize=heat_trans_loss)
     model.cold_trans_loss = pyo.Param(initialize=cold_trans_loss)
     # Variable
-    model.Pbuy_market = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Psell_market = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.U_buy_sell_market = pyo.Var(model.T, within=pyo.Binary, initialize=0)
+    # Limits that don't depend on other variables are given as bounds rather than as constraints, since the solver
+    # handles bounds much more efficiently than constraint rows
+    model.Pbuy_market = pyo.Var(model.T, bounds=(0, model.Pmax_market), within=pyo.NonNegativeReals, initialize=0)
+    model.Psell_market = pyo.Var(model.T, bounds=(0, model.Pmax_market), within=pyo.NonNegativeReals, initialize=0)
+    if model.market_binary_needed:
+        model.U_buy_sell_market = pyo.Var(model.T, within=pyo.Binary, initialize=0)
     model.Hbuy_market = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
     model.Pbuy_grid = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
     model.Psell_grid = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
     model.U_power_buy_sell_grid = pyo.Var(model.I, model.T, within=pyo.Binary, initialize=0)
-    model.Hbuy_grid = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Hsell_grid = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
+    model.Hbuy_grid = pyo.Var(model.I, model.T, bounds=(0, model.Hmax_grid), within=pyo.NonNegativeReals, initialize=0)
+    model.Hsell_grid = pyo.Var(model.I, model.T, bounds=(0, model.Hmax_grid), within=pyo.NonNegativeReals,
+                               initialize=0)
     model.Cbuy_grid = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
     model.Csell_grid = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Pcha = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Pdis = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
+    # Maximum charging/discharging power limitations of the batteries
+    model.Pcha = pyo.Var(model.I, model.T, bounds=lambda m, i, t: (0, m.Pmax_BES_Cha[i]), within=pyo.NonNegativeReals,
+                         initialize=0)
+    model.Pdis = pyo.Var(model.I, model.T, bounds=lambda m, i, t: (0, m.Pmax_BES_Dis[i]), within=pyo.NonNegativeReals,
+                         initialize=0)
     model.SOCBES = pyo.Var(model.I, model.T, bounds=(0, 1), within=pyo.NonNegativeReals,
                            initialize=lambda m, i, t: SOCBES0[i])
-    model.Hhp = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
+    model.Hhp = pyo.Var(model.I, model.T, bounds=lambda m, i, t: (0, m.Hhpmax[i]), within=pyo.NonNegativeReals,
+                        initialize=0)
     model.Chp = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Php = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
+    model.Php = pyo.Var(model.I, model.T, bounds=lambda m, i, t: (0, m.Phpmax[i]), within=pyo.NonNegativeReals,
+                        initialize=0)
     model.HTEScha = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
     model.HTESdis = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
     model.SOCTES = pyo.Var(model.I, model.T, bounds=(0, 1), within=pyo.NonNegativeReals,
                            initialize=lambda m, i, t: SOCTES0[i])
+    # Without storage capacity, the storage variables are constant. Fixing them means they are left out of the problem
+    # passed to the solver, while their values can still be read from the model afterwards.
+    for i in model.I:
+        if battery_capacity[i] == 0:
+            model.Pcha[i, :].fix(0)
+            model.Pdis[i, :].fix(0)
+            model.SOCBES[i, :].fix(SOCBES0[i])
+        if kwh_per_deg[i] == 0:
+            model.HTEScha[i, :].fix(0)
+            model.HTESdis[i, :].fix(0)
+            model.SOCTES[i, :].fix(SOCTES0[i])
     model.Ccc = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
     model.Hcc = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Pcc = pyo.Var(model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Energy_shallow = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
+    model.Pcc = pyo.Var(model.T, bounds=(0, model.Pccmax), within=pyo.NonNegativeReals, initialize=0)
+    model.Energy_shallow = pyo.Var(model.I, model.T, bounds=lambda m, i, t: (0, m.Energy_shallow_cap[i]),
+                                   within=pyo.NonNegativeReals, initialize=0)
     # Charge/discharge of the shallow layer, a negative value meaning discharge
     model.Hcha_shallow = pyo.Var(model.I, model.T, within=pyo.Reals, initialize=0)
     model.Flow = pyo.Var(model.I, model.T, within=pyo.Reals, initialize=0)
     model.Loss_shallow = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
-    model.Energy_deep = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
+    model.Energy_deep = pyo.Var(model.I, model.T, bounds=lambda m, i, t: (0, m.Energy_deep_cap[i]),
+                                within=pyo.NonNegativeReals, initialize=0)
     model.Loss_deep = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
     if summer_mode:
-        model.HhpB = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
+        model.HhpB = pyo.Var(model.I, model.T, bounds=lambda m, i, t: (0, m.HhpBmax[i]), within=pyo.NonNegativeReals,
+                             initialize=0)
         model.PhpB = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
     model.heat_dump = pyo.Var(model.I, model.T, within=pyo.NonNegativeReals, initialize=0)
     # This variable will keep track of the unused excess cooling for us. No penalty associated with it - this cooling
@@ -218,11 +249,10 @@ def add_obj_and_constraints(model: pyo.ConcreteModel, summer_mode: bool, month:
     # Objective function:
     model.obj = pyo.Objective(rule=obj_rul, sense=pyo.minimize)
     model.con_max_Pbuy_grid = pyo.Constraint(model.I, model.T, rule=max_Pbuy_grid)
-    model.con_max_Hbuy_grid = pyo.Constraint(model.I, model.T, rule=max_Hbuy_grid)
     model.con_max_Psell_grid = pyo.Constraint(model.I, model.T, rule=max_Psell_grid)
-    model.con_max_Pbuy_market = pyo.Constraint(model.T, rule=max_Pbuy_market)
-    model.con_max_Psell_market = pyo.Constraint(model.T, rule=max_Psell_market)
-    model.con_max_Hsell_grid = pyo.Constraint(model.I, model.T, rule=max_Hsell_grid)
+    if model.market_binary_needed:
+        model.con_max_Pbuy_market = pyo.Constraint(model.T, rule=max_Pbuy_market)
+        model.con_max_Psell_market = pyo.Constraint(model.T, rule=max_Psell_market)
     if summer_mode:
         model.con_agent_Pbalance_summer = pyo.Constraint(model.I, model.T, rule=agent_Pbalance_summer)
         model.con_agent_Hbalance_summer = pyo.Constraint(model.I, model.T, rule=agent_Hbalance_summer)
@@ -245,22 +275,15 @@ def add_obj_and_constraints(model: pyo.ConcreteModel, summer_mode: bool, month:
     model.con_BITES_deep_loss = pyo.Constraint(model.I, model.T, rule=BITES_deep_loss)
     model.con_BITES_max_Hdis_shallow = pyo.Constraint(model.I, model.T, rule=BITES_max_Hdis_shallow)
     model.con_BITES_max_Hcha_shallow = pyo.Constraint(model.I, model.T, rule=BITES_max_Hcha_shallow)
-    model.con_BITES_max_Eshallow = pyo.Constraint(model.I, model.T, rule=BITES_max_Eshallow)
-    model.con_BITES_max_Edeep = pyo.Constraint(model.I, model.T, rule=BITES_max_Edeep)
     model.con_LEC_Pbalance = pyo.Constraint(model.T, rule=LEC_Pbalance)
     model.con_LEC_Hbalance = pyo.Constraint(model.T, rule=LEC_Hbalance)
     model.con_LEC_Cbalance = pyo.Constraint(model.T, rule=LEC_Cbalance)
-    model.con_BES_max_dis = pyo.Constraint(model.I, model.T, rule=BES_max_dis)
-    model.con_BES_max_cha = pyo.Constraint(model.I, model.T, rule=BES_max_cha)
     model.con_BES_Ebalance = pyo.Constraint(model.I, model.T, rule=BES_Ebalance)
     model.con_BES_final_SOC = pyo.Constraint(model.I, rule=BES_final_SOC)
     model.con_BES_remove_binaries = pyo.Constraint(model.I, model.T, rule=BES_remove_binaries)
     model.con_HP_Hproduct = pyo.Constraint(model.I, model.T, rule=HP_Hproduct)
     model.con_HP_Cproduct = pyo.Constraint(model.I, model.T, rule=HP_Cproduct)
-    model.con_max_HP_Hproduct = pyo.Constraint(model.I, model.T, rule=max_HP_Hproduct)
-    model.con_max_HP_Pconsumption = pyo.Constraint(model.I, model.T, rule=max_HP_Pconsumption)
     if summer_mode:
-        model.con_max_booster_HP_Hproduct_summer = pyo.Constraint(model.I, model.T, rule=max_booster_HP_Hproduct_summer)
         model.con_chiller_Hwaste_summer = pyo.Constraint(model.T, rule=chiller_Hwaste_summer)
     else:
         model.con_chiller_Hwaste_winter = pyo.Constraint(model.T, rule=chiller_Hwaste_winter)
@@ -269,7 +292,6 @@ def add_obj_and_constraints(model: pyo.ConcreteModel, summer_mode: bool, month:
     model.con_HTES_Ebalance = pyo.Constraint(model.I, model.T, rule=HTES_Ebalance)
     model.con_HTES_final_SOC = pyo.Constraint(model.I, rule=HTES_final_SOC)
     model.con_chiller_Cpower_product = pyo.Constraint(model.T, rule=chiller_Cpower_product)
-    model.con_max_chiller_Cpower_product = pyo.Constraint(model.T, rule=max_chiller_Cpower_product)
     model.con_elec_peak_load1 = pyo.Constraint(model.T, rule=elec_peak_load1)
     model.con_elec_peak_load2 = pyo.Constraint(rule=elec_peak_load2)
     model.con_elec_peak_load3 = pyo.Constraint(rule=elec_peak_load3)
@@ -302,20 +324,13 @@ def max_Pbuy_grid(model, i, t):
     return model.Pbuy_grid[i, t] <= model.Pmax_grid * model.U_power_buy_sell_grid[i, t]
 
 
-def max_Hbuy_grid(model, i, t):
-    return model.Hbuy_grid[i, t] <= model.Hmax_grid  # * model.U_heat_buy_sell_grid[i, t]
-
-
 def max_Psell_grid(model, i, t):
     return model.Psell_grid[i, t] <= model.Pmax_grid * (1 - model.U_power_buy_sell_grid[i, t])
 
 
-def max_Hsell_grid(model, i, t):
-    return model.Hsell_grid[i, t] <= model.Hmax_grid
-
-
 # Buying and selling power from the market cannot happen at the same time
 # and should be restricted to its maximum value (Pmax_market) (eqs. 2 and 4 of the report)
+# The maximum value is a variable bound, these are only used when the binary variable is needed
 def max_Pbuy_market(model, t):
     return model.Pbuy_market[t] <= model.Pmax_market * model.U_buy_sell_market[t]
 
@@ -462,14 +477,6 @@ def BITES_Eflow_between_storages(model, i, t):
                                 - (model.Energy_deep[i, t] / model.Energy_deep_cap[i])) * model.Kval[i]
 
 
-def BITES_max_Eshallow(model, i, t):
-    return model.Energy_shallow[i, t] <= model.Energy_shallow_cap[i]
-
-
-def BITES_max_Edeep(model, i, t):
-    return model.Energy_deep[i, t] <= model.Energy_deep_cap[i]
-
-
 def BITES_shallow_loss(model, i, t):
     if t == 0:
         return model.Loss_shallow[i, 0] == 0
@@ -511,20 +518,12 @@ def LEC_Cbalance(model, t):
 
 
 # Battery energy storage model (eqs. 16 to 19 of the report)
-# Maximum charging/discharging power limitations
-def BES_max_dis(model, i, t):
-    return model.Pdis[i, t] <= model.Pmax_BES_Dis[i]
-
-
-def BES_max_cha(model, i, t):
-    return model.Pcha[i, t] <= model.Pmax_BES_Cha[i]
-
-
+# Maximum charging/discharging power limitations are variable bounds
 # State of charge modelling
 def BES_Ebalance(model, i, t):
     if model.Emax_BES[i] == 0:
-        # No storage capacity, then we need to ensure that charge and discharge are 0 as well.
-        return model.Pcha[i, t] + model.Pdis[i, t] == model.Emax_BES[i]
+        # No storage capacity, charge and discharge have been fixed to 0
+        return pyo.Constraint.Skip
     # We assume that model.effe cannot be 0
     if t == 0:
         charge = model.Pcha[i, 0] * model.effe / model.Emax_BES[i]
@@ -537,7 +536,9 @@ def BES_Ebalance(model, i, t):
 
 
 def BES_final_SOC(model, i):
-    return model.SOCBES[i, len(model.T) - 1] == model.SOCBES0[i]
+    if model.Emax_BES[i] == 0:
+        return pyo.Constraint.Skip
+    return model.SOCBES[i, model.T.last()] == model.SOCBES0[i]
 
 
 def BES_remove_binaries(model, i, t):
@@ -559,25 +560,12 @@ def HP_Cproduct(model, i, t):
         return model.Chp[i, t] == 0
 
 
-def max_HP_Hproduct(model, i, t):
-    return model.Hhp[i, t] <= model.Hhpmax[i]
-
-
-def max_HP_Pconsumption(model, i, t):
-    return model.Php[i, t] <= model.Phpmax[i]
-
-
 # Booster heat pump model (eq. 20 of the report)
 def booster_HP_Hproduct(model, i, t):
     # Only used in summer mode
     return model.HhpB[i, t] == model.COPhpB[i] * model.PhpB[i, t]
 
 
-def max_booster_HP_Hproduct_summer(model, i, t):
-    # Only used in summer mode
-    return model.HhpB[i, t] <= model.HhpBmax[i]
-
-
 # Thermal energy storage model (eqs. 32 to 25 of the report)
 # Maximum/minimum temperature limitations of hot water inside TES
 # def max_HTES_dis(model, i, t):
@@ -591,8 +579,8 @@ def max_booster_HP_Hproduct_summer(model, i, t):
 # State of charge modelling
 def HTES_Ebalance(model, i, t):
     if model.kwh_per_deg[i] == 0:
-        # No storage capacity, then we need to ensure that charge and discharge are 0 as well.
-        return model.HTESdis[i, t] + model.HTEScha[i, t] == model.kwh_per_deg[i]
+        # No storage capacity, charge and discharge have been fixed to 0
+        return pyo.Constraint.Skip
     # We assume that model.efft and model.Tmax_TES cannot be 0
     charge = model.HTEScha[i, t] * model.efft[i] / (model.kwh_per_deg[i] * model.Tmax_TES[i])
     discharge = model.HTESdis[i, t] / ((model.kwh_per_deg[i] * model.Tmax_TES[i]) * model.efft[i])
@@ -604,7 +592,9 @@ def HTES_Ebalance(model, i, t):
 
 
 def HTES_final_SOC(model, i):
-    return model.SOCTES[i, len(model.T) - 1] == model.SOCTES0[i]
+    if model.kwh_per_deg[i] == 0:
+        return pyo.Constraint.Skip
+    return model.SOCTES[i, model.T.last()] == model.SOCTES0[i]
 
 
 # Compression chiller model (eqs. 29 to 31 of the report)
@@ -612,10 +602,6 @@ def chiller_Cpower_product(model, t):
     return model.Ccc[t] == model.COPcc * model.Pcc[t]
 
 
-def max_chiller_Cpower_product(model, t):
-    return model.Pcc[t] <= model.Pccmax
-
-
 def chiller_Hwaste_summer(model, t):
     # Only used in summer mode
     return model.Hcc[t] == (1 + model.COPcc) * model.Pcc[t] * model.chiller_heat_recovery
@@ -1,3 +1,7 @@
+from typing import Dict, Tuple
+
+import pandas as pd
+
 # This share of high-temp heat need can be covered by low-temp heat (source: BDAB). The rest needs to be covered by
 # a booster heat pump.
 PERC_OF_HT_COVERABLE_BY_LT = 0.6
@@ -11,3 +15,18 @@ class CEMSError(Exception):
         self.message = message
         self.agent_indices = agent_indices
         self.hour_indices = hour_indices
+
+
+def series_to_param_dict(series: pd.Series, trading_horizon: int) -> Dict[int, float]:
+    """
+    Values of the series by position, for initializing a Param indexed by model.T. Building the dict in one go is much
+    faster than having Pyomo call a function that does a pandas lookup for each index.
+    """
+    return dict(enumerate(series.to_numpy()[:trading_horizon].tolist()))
+
+
+def df_to_param_dict(df: pd.DataFrame, trading_horizon: int) -> Dict[Tuple[int, int], float]:
+    """Values of the dataframe by (row, column) position, for initializing a Param indexed by model.I and model.T."""
+    return {(i, t): value
+            for i, row in enumerate(df.to_numpy()[:, :trading_horizon].tolist())
+            for t, value in enumerate(row)}
@@ -1,5 +1,6 @@
 import datetime
 import logging
+from collections import defaultdict
 from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
 import numpy as np
@@ -10,7 +11,7 @@ import pyomo.environ as pyo
 from pyomo.core.base.param import IndexedParam, ScalarParam
 from pyomo.core.base.var import IndexedVar
 from pyomo.opt import OptSolver, SolverResults, TerminationCondition
-from pyomo.util.infeasible import find_infeasible_constraints, log_infeasible_constraints
+from pyomo.util.infeasible import find_infeasible_constraints, log_infeasible_bounds, log_infeasible_constraints
 
 from tradingplatformpoc import constants
 from tradingplatformpoc.agent.block_agent import BlockAgent
@@ -66,6 +67,17 @@ class InfeasibilityError(CEMSError):
         self.constraints = constraints
 
 
+class SolverTimeoutError(InfeasibilityError):
+    """
+    The solver reached its time limit before finding any feasible solution. The problem may well be feasible, so no
+    constraints are blamed.
+    """
+
+    def __init__(self, message: str, agent_names: List[str], horizon_start: datetime.datetime,
+                 horizon_end: datetime.datetime):
+        super().__init__(message, agent_names, [], horizon_start, horizon_end, set())
+
+
 def optimize(solver: OptSolver, block_agents: List[BlockAgent], grid_agents: Dict[Resource, GridAgent],
              area_info: Dict[str, Any], start_datetime: datetime.datetime,
              elec_pricing: ElectricityPrice, heat_pricing: HeatingPrice,
@@ -91,14 +103,14 @@ def optimize(solver: OptSolver, block_agents: List[BlockAgent], grid_agents: Dic
     booster_max_heat = [agent.booster_pump_max_output for agent in block_agents]
     atemp_for_bites = [agent.digital_twin.atemp * agent.frac_for_bites for agent in block_agents]
     hp_produce_cooling = [agent.digital_twin.hp_produce_cooling for agent in block_agents]
-    shallow_storage_start = [(shallow_storage_start_dict[agent] if agent in shallow_storage_start_dict.keys() else 0.0)
-                             for agent in agent_guids]
-    deep_storage_start = [(deep_storage_start_dict[agent] if agent in shallow_storage_start_dict.keys() else 0.0)
-                          for agent in agent_guids]
+    shallow_storage_start = [shallow_storage_start_dict.get(agent, 0.0) for agent in agent_guids]
+    deep_storage_start = [deep_storage_start_dict.get(agent, 0.0) for agent in agent_guids]
 
     nordpool_prices: pd.Series = elec_pricing.get_nordpool_price_for_periods(start_datetime, trading_horizon)
     nordpool_prices = nordpool_prices.reset_index(drop=True)
     heat_retail_price = heat_pricing.get_retail_price_excl_effect_fee(start_datetime)
+    elec_peak_load_fee = elec_pricing.get_effect_fee_per_day(start_datetime)
+    heat_peak_load_fee = heat_pricing.get_effect_fee_per_day(start_datetime)
 
     n_agents = len(block_agents)
     summer_mode = should_use_summer_mode(start_datetime)
@@ -151,8 +163,8 @@ def optimize(solver: OptSolver, block_agents: List[BlockAgent], grid_agents: Dic
                 trading_horizon=trading_horizon,
                 elec_tax_fee=elec_pricing.tax,
                 elec_trans_fee=elec_pricing.transmission_fee,
-                elec_peak_load_fee=elec_pricing.get_effect_fee_per_day(start_datetime),
-                heat_peak_load_fee=heat_pricing.get_effect_fee_per_day(start_datetime),
+                elec_peak_load_fee=elec_peak_load_fee,
+                heat_peak_load_fee=heat_peak_load_fee,
                 incentive_fee=elec_pricing.wholesale_offset,
                 hist_top_three_elec_peak_load=elec_pricing.get_top_three_hourly_outtakes_for_month(start_datetime),
                 hist_monthly_heat_peak_energy=heat_pricing.get_avg_peak_for_month(start_datetime)
@@ -202,8 +214,8 @@ def optimize(solver: OptSolver, block_agents: List[BlockAgent], grid_agents: Dic
                     trading_horizon=trading_horizon,
                     elec_tax_fee=elec_pricing.tax,
                     elec_trans_fee=elec_pricing.transmission_fee,
-                    elec_peak_load_fee=elec_pricing.get_effect_fee_per_day(start_datetime),
-                    heat_peak_load_fee=heat_pricing.get_effect_fee_per_day(start_datetime),
+                    elec_peak_load_fee=elec_peak_load_fee,
+                    heat_peak_load_fee=heat_peak_load_fee,
                     incentive_fee=elec_pricing.wholesale_offset,
                     hist_top_three_elec_peak_load=elec_pricing.get_top_three_hourly_outtakes_for_month(
                         start_datetime, agent_id),
@@ -224,6 +236,8 @@ def optimize(solver: OptSolver, block_agents: List[BlockAgent], grid_agents: Dic
             TradeMetadataKey.COOL_DUMP: sum_for_all_agents(metadata_per_agent_and_period[TradeMetadataKey.COOL_DUMP])
         }
         return ChalmersOutputs(all_trades, metadata_per_agent_and_period, metadata_per_period)
+    except SolverTimeoutError:
+        raise
     except CEMSError as e:
         raise InfeasibilityError(message=e.message,
                                  agent_names=e.agent_names if isinstance(e, InfeasibilityError) else
@@ -236,29 +250,48 @@ def optimize(solver: OptSolver, block_agents: List[BlockAgent], grid_agents: Dic
 
 def sum_for_all_agents(dict_per_agent_and_period: Dict[str, Dict[datetime.datetime, float]]) \
         -> Dict[datetime.datetime, float]:
-    return {date: sum(inner_dict[date] for inner_dict in dict_per_agent_and_period.values() if date in inner_dict)
-            for date in set(date for inner_dict in dict_per_agent_and_period.values() for date in inner_dict)}
+    totals: Dict[datetime.datetime, float] = {}
+    for inner_dict in dict_per_agent_and_period.values():
+        for date, value in inner_dict.items():
+            totals[date] = totals.get(date, 0) + value
+    return totals
 
 
 def flip_dict_keys(all_metadata: Dict[str, Dict[TradeMetadataKey, Dict[datetime.datetime, float]]]) \
         -> Dict[TradeMetadataKey, Dict[str, Dict[datetime.datetime, float]]]:
-    metadata_per_agent: Dict[TradeMetadataKey, Dict[str, Dict[datetime.datetime, float]]] = {}
+    metadata_per_agent: Dict[TradeMetadataKey, Dict[str, Dict[datetime.datetime, float]]] = defaultdict(dict)
     for agent_name, inner_dict in all_metadata.items():
         for metadata_key, date_value_dict in inner_dict.items():
-            if metadata_key not in metadata_per_agent:
-                metadata_per_agent[metadata_key] = {}
             metadata_per_agent[metadata_key][agent_name] = date_value_dict
-    return metadata_per_agent
+    return dict(metadata_per_agent)
 
 
 def handle_infeasibility(optimized_model: pyo.ConcreteModel, results: SolverResults, start_datetime: datetime.datetime,
                          trading_horizon: int, agent_names: List[str]):
-    """If the solver exits with infeasibility, log this, and raise an informative error."""
-    if results.solver.termination_condition != TerminationCondition.optimal:
+    """
+    If the solver exits with infeasibility, log this, and raise an informative error. A 'feasible' termination
+    condition means that the solver hit its time limit in a MIP, but had found an integer solution, which is then used.
+    If the time limit was reached before any solution was found, a SolverTimeoutError is raised instead, since the
+    variable values can't tell us anything about which constraints are at fault.
+    """
+    termination_condition = results.solver.termination_condition
+    if termination_condition == TerminationCondition.maxTimeLimit:
+        raise SolverTimeoutError(message='Solver time limit reached before a feasible solution was found',
+                                 agent_names=agent_names,
+                                 horizon_start=start_datetime,
+                                 horizon_end=start_datetime + datetime.timedelta(hours=trading_horizon))
+    if termination_condition == TerminationCondition.feasible:
+        logger.warning('Solver time limit reached for horizon starting {:%Y-%m-%d %H:%M}, using a solution that may '
+                       'not be optimal'.format(start_datetime))
+    if termination_condition not in [TerminationCondition.optimal, TerminationCondition.feasible]:
         constraint_names_no_index: Set[str] = set()
         for constraint, _body_value, _infeasible in find_infeasible_constraints(optimized_model):
             constraint_names_no_index.add(constraint.name.split('[')[0])
-        log_infeasible_constraints(optimized_model)
+        # These log at INFO level to Pyomo's logger, and go through the whole model, so only call them if that will
+        # actually produce any output
+        if logging.getLogger('pyomo.util.infeasible').isEnabledFor(logging.INFO):
+            log_infeasible_constraints(optimized_model)
+            log_infeasible_bounds(optimized_model)
         raise InfeasibilityError(message='Infeasible optimization problem',
                                  agent_names=agent_names,
                                  hour_indices=[],
@@ -364,70 +397,29 @@ def extract_outputs_for_lec(optimized_model: pyo.ConcreteModel,
     }
     heat_dump_per_agent = get_value_per_agent(optimized_model, start_datetime, 'heat_dump', agent_guids,
                                               lambda i: True)
-    heat_dump_total = {dt: sum(inner_dict[dt] for inner_dict in heat_dump_per_agent.values() if dt in inner_dict)
-                       for dt in set(key for inner_dict in heat_dump_per_agent.values() for key in inner_dict)}
-    metadata_per_period[TradeMetadataKey.HEAT_DUMP] = heat_dump_total
+    metadata_per_period[TradeMetadataKey.HEAT_DUMP] = sum_for_all_agents(heat_dump_per_agent)
     return ChalmersOutputs(elec_trades + heat_trades + cool_trades, metadata_per_agent_and_period, metadata_per_period)
 
 
 def build_supply_and_demand_dfs(agents: List[BlockAgent], start_datetime: datetime.datetime, trading_horizon: int) -> \
         Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame,
               pd.DataFrame]:
-    elec_demand = []
-    elec_supply = []
-    high_heat_demand = []
-    high_heat_supply = []
-    low_heat_demand = []
-    low_heat_supply = []
-    cooling_demand = []
-    cooling_supply = []
-    for agent in agents:
-        agent_elec_demand: List[float] = []
-        agent_elec_supply: List[float] = []
-        agent_high_heat_demand: List[float] = []
-        agent_high_heat_supply: List[float] = []
-        agent_low_heat_demand: List[float] = []
-        agent_low_heat_supply: List[float] = []
-        agent_cooling_demand: List[float] = []
-        agent_cooling_supply: List[float] = []
-        for hour in range(trading_horizon):
-            usage_per_resource = agent.get_actual_usage(start_datetime + datetime.timedelta(hours=hour))
-            add_usage_to_demand_list(agent_elec_demand, usage_per_resource[Resource.ELECTRICITY])
-            add_usage_to_supply_list(agent_elec_supply, usage_per_resource[Resource.ELECTRICITY])
-            add_usage_to_demand_list(agent_high_heat_demand, usage_per_resource[Resource.HIGH_TEMP_HEAT])
-            add_usage_to_supply_list(agent_high_heat_supply, usage_per_resource[Resource.HIGH_TEMP_HEAT])
-            add_usage_to_demand_list(agent_low_heat_demand, usage_per_resource[Resource.LOW_TEMP_HEAT])
-            add_usage_to_supply_list(agent_low_heat_supply, usage_per_resource[Resource.LOW_TEMP_HEAT])
-            add_usage_to_demand_list(agent_cooling_demand, usage_per_resource[Resource.COOLING])
-            add_usage_to_supply_list(agent_cooling_supply, usage_per_resource[Resource.COOLING])
-        elec_demand.append(agent_elec_demand)
-        elec_supply.append(agent_elec_supply)
-        high_heat_demand.append(agent_high_heat_demand)
-        high_heat_supply.append(agent_high_heat_supply)
-        low_heat_demand.append(agent_low_heat_demand)
-        low_heat_supply.append(agent_low_heat_supply)
-        cooling_demand.append(agent_cooling_demand)
-        cooling_supply.append(agent_cooling_supply)
-    elec_demand_df = pd.DataFrame(elec_demand)
-    elec_supply_df = pd.DataFrame(elec_supply)
-    high_heat_demand_df = pd.DataFrame(high_heat_demand)
-    high_heat_supply_df = pd.DataFrame(high_heat_supply)
-    low_heat_demand_df = pd.DataFrame(low_heat_demand)
-    low_heat_supply_df = pd.DataFrame(low_heat_supply)
-    cooling_demand_df = pd.DataFrame(cooling_demand)
-    cooling_supply_df = pd.DataFrame(cooling_supply)
+    # Net usage per resource, agent and hour. Positive values are demand, negative values are supply.
+    resources = [Resource.ELECTRICITY, Resource.HIGH_TEMP_HEAT, Resource.LOW_TEMP_HEAT, Resource.COOLING]
+    usage = np.empty((len(resources), len(agents), trading_horizon))
+    periods = [start_datetime + datetime.timedelta(hours=hour) for hour in range(trading_horizon)]
+    for i_agent, agent in enumerate(agents):
+        for hour, period in enumerate(periods):
+            usage_per_resource = agent.get_actual_usage(period)
+            usage[:, i_agent, hour] = [usage_per_resource[resource] for resource in resources]
+    demand = np.where(usage > 0, usage, 0.0)
+    supply = np.where(usage < 0, -usage, 0.0)
+    elec_demand_df, high_heat_demand_df, low_heat_demand_df, cooling_demand_df = (pd.DataFrame(arr) for arr in demand)
+    elec_supply_df, high_heat_supply_df, low_heat_supply_df, cooling_supply_df = (pd.DataFrame(arr) for arr in supply)
     return (elec_demand_df, elec_supply_df, high_heat_demand_df, high_heat_supply_df,
             low_heat_demand_df, low_heat_supply_df, cooling_demand_df, cooling_supply_df)
 
 
-def add_usage_to_demand_list(agent_list: List[float], usage_of_resource: float):
-    agent_list.append(usage_of_resource if usage_of_resource > 0 else 0)
-
-
-def add_usage_to_supply_list(agent_list: List[float], usage_of_resource: float):
-    agent_list.append(-usage_of_resource if usage_of_resource < 0 else 0)
-
-
 def get_power_transfers(optimized_model: pyo.ConcreteModel, start_datetime: datetime.datetime, grid_agent_guid: str,
                         agent_guids: List[str], resource_price_data: ElectricityPrice, local_market_enabled: bool) \
         -> List[Trade]:
@@ -779,14 +771,15 @@ def get_value_per_agent(optimized_model: pyo.ConcreteModel, start_datetime: date
     If "divide_by" is specified, all quantities will be divided by "divide_by(agent_index)". Can be used to translate
     energy quantities to % of max, for example.
     """
+    # Extract all values of the variable in one go, rather than going through the model for each index
+    values = getattr(optimized_model, variable_name).extract_values()
+    periods = [(hour, start_datetime + datetime.timedelta(hours=hour)) for hour in optimized_model.T]
     dict_to_add_to: Dict[str, Dict[datetime.datetime, Any]] = {}
-    for hour in optimized_model.T:
-        period = start_datetime + datetime.timedelta(hours=hour)
-        for i_agent in optimized_model.I:
-            if should_add_for_agent(i_agent):
-                quantity = pyo.value(getattr(optimized_model, variable_name)[i_agent, hour])
-                value = round(quantity / divide_by(i_agent), DECIMALS_TO_ROUND_TO)
-                add_to_nested_dict(dict_to_add_to, agent_guids[i_agent], period, value)
+    for i_agent in optimized_model.I:
+        if should_add_for_agent(i_agent):
+            denominator = divide_by(i_agent)
+            dict_to_add_to[agent_guids[i_agent]] = {
+                period: round(values[i_agent, hour] / denominator, DECIMALS_TO_ROUND_TO) for hour, period in periods}
     return dict_to_add_to
 
 
@@ -795,9 +788,6 @@ def get_value_per_period(optimized_model: pyo.ConcreteModel, start_datetime: dat
     """
     Example variable names: "heat_dump" for heat reservoir.
     """
-    dict_to_add_to: Dict[datetime.datetime, Any] = {}
-    for hour in optimized_model.T:
-        period = start_datetime + datetime.timedelta(hours=hour)
-        quantity = pyo.value(getattr(optimized_model, variable_name)[hour])
-        dict_to_add_to[period] = round(quantity, DECIMALS_TO_ROUND_TO)
-    return dict_to_add_to
+    values = getattr(optimized_model, variable_name).extract_values()
+    return {start_datetime + datetime.timedelta(hours=hour): round(values[hour], DECIMALS_TO_ROUND_TO)
+            for hour in optimized_model.T}
@@ -42,14 +42,14 @@ from tradingplatformpoc.sql.level.models import Level as TableLevel
 from tradingplatformpoc.sql.trade.crud import trades_to_db_dict
 from tradingplatformpoc.sql.trade.models import Trade as TableTrade
 from tradingplatformpoc.trading_platform_utils import add_all_to_nested_dict, add_all_to_twice_nested_dict, \
-    calculate_solar_prod, get_external_prices, get_final_storage_level, get_glpk_solver
+    calculate_solar_prod_for_agents, get_external_prices, get_final_storage_level, get_glpk_solver
 
 logger = logging.getLogger(__name__)
 
 
 class TradingSimulator:
     def __init__(self, job_id: str):
-        self.solver: OptSolver = get_glpk_solver()
+        self.solver: OptSolver = get_glpk_solver(settings.GLPK_MIP_GAP, settings.GLPK_TIME_LIMIT_S)
         self.job_id: str = job_id
         self.config_id: str = get_config_id_for_job_id(self.job_id)
         self.config_data: Dict[str, Any] = read_config(self.config_id)
@@ -114,6 +114,14 @@ class TradingSimulator:
         # Get mock data
         blocks_mock_data: pd.DataFrame = get_generated_mock_data(self.config_id)
         area_info = self.config_data['AreaInfo']
+        # Calculate PV production for all agents with solar panels at once
+        agents_with_pv = [agent for agent in self.config_data["Agents"]
+                          if agent["Type"] in ("BlockAgent", "GroceryStoreAgent")]
+        pv_prod_per_agent = calculate_solar_prod_for_agents(
+            inputs_df['irradiation'],
+            {agent['Name']: agent['PVArea'] for agent in agents_with_pv},
+            {agent['Name']: area_info['PVEfficiency'] if agent["Type"] == "BlockAgent" else agent['PVEfficiency']
+             for agent in agents_with_pv})
 
         for agent in self.config_data["Agents"]:
             agent_type = agent["Type"]
@@ -128,9 +136,7 @@ class TradingSimulator:
                 space_heat_cons_series = blocks_mock_data.get(get_space_heat_cons_key(agent_id))
                 hot_tap_water_cons_series = blocks_mock_data.get(get_hot_tap_water_cons_key(agent_id))
                 cool_cons_series = blocks_mock_data.get(get_cooling_cons_key(agent_id))
-                pv_prod_series = calculate_solar_prod(inputs_df['irradiation'],
-                                                      agent['PVArea'],
-                                                      area_info['PVEfficiency'])
+                pv_prod_series = pv_prod_per_agent[agent_name]
 
                 block_digital_twin = StaticDigitalTwin(atemp=agent['Atemp'],
                                                        electricity_usage=elec_cons_series,
@@ -158,9 +164,7 @@ class TradingSimulator:
                 # This is not used at the moment! Built to emulate the Coop store across the road from the Jonstaka
                 # site, which would fully participate in the LEC. The "HeatProducerAgent" grocery store profile on the
                 # other hand, only sells heating to the LEC, it doesn't participate in the LEC in any other sense.
-                pv_prod_series = calculate_solar_prod(inputs_df['irradiation'],
-                                                      agent['PVArea'],
-                                                      agent['PVEfficiency'])
+                pv_prod_series = pv_prod_per_agent[agent_name]
                 space_heat_prod = inputs_df['coop_space_heating_produced'] if agent['SellExcessHeat'] else None
                 # Scaling here to fit BDAB's estimate (docs/Heat production.md)
                 space_heat_prod = space_heat_prod / 4.0
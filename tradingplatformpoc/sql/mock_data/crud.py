@@ -1,3 +1,4 @@
+import io
 import json
 import logging
 from contextlib import _GeneratorContextManager
@@ -19,18 +20,33 @@ from tradingplatformpoc.sql.mock_data.models import MockData
 logger = logging.getLogger(__name__)
 
 
+# Parquet files start with these bytes. Mock data stored before the switch to Parquet is JSON.
+PARQUET_MAGIC_BYTES = b'PAR1'
+
+
 def mock_data_df_to_db_dict(db_agent_id: str, mock_data_constants: Dict[str, float],
                             agent_mock_data_pl: pl.DataFrame):
     """
-    Convert mock data from dataframe to binary in order to store in database.
+    Convert mock data from dataframe to binary (Parquet) in order to store in database.
     """
-    agent_mock_data_df = agent_mock_data_pl.to_pandas().set_index('datetime')
-    agent_mock_data_df.index = agent_mock_data_df.index.strftime('%Y-%m-%d %H:%M:%S.%f')
-    agent_mock_data_dict = agent_mock_data_df.to_dict()
-    agent_mock_data_binary = json.dumps(agent_mock_data_dict).encode('utf-8')
+    buffer = io.BytesIO()
+    agent_mock_data_pl.write_parquet(buffer, compression='zstd', compression_level=3)
     return {'agent_id': db_agent_id,
             'mock_data_constants': mock_data_constants,
-            'mock_data': agent_mock_data_binary}
+            'mock_data': buffer.getvalue()}
+
+
+def mock_data_binary_to_df(mock_data_binary: bytes) -> pl.DataFrame:
+    """
+    Convert mock data stored in the database back to a dataframe. Handles both Parquet and the older JSON format.
+    """
+    if mock_data_binary[:len(PARQUET_MAGIC_BYTES)] == PARQUET_MAGIC_BYTES:
+        return pl.read_parquet(io.BytesIO(mock_data_binary))
+    mock_data_dict = json.loads(mock_data_binary.decode('utf-8'))
+    mock_data_df = pd.DataFrame.from_records(mock_data_dict)
+    mock_data_df.index = pd.to_datetime(mock_data_df.index, utc=True)
+    mock_data_df = mock_data_df.reset_index().rename(columns={'index': 'datetime'})
+    return pl.from_pandas(mock_data_df)
 
 
 def db_to_mock_data_df(mock_data_id: str,
@@ -45,11 +61,7 @@ def db_to_mock_data_df(mock_data_id: str,
         mock_data = db.query(MockData.mock_data).filter(MockData.id == mock_data_id).first()
         
         if mock_data is not None:
-            mock_data_dict = json.loads(mock_data[0].decode('utf-8'))
-            mock_data_df = pd.DataFrame.from_records(mock_data_dict)
-            mock_data_df.index = pd.to_datetime(mock_data_df.index, utc=True)
-            mock_data_df = mock_data_df.reset_index().rename(columns={'index': 'datetime'})
-            return pl.from_pandas(mock_data_df)
+            return mock_data_binary_to_df(bytes(mock_data[0]))
         else:
             raise Exception('No mock data found in database for ID {}'.format(mock_data_id))
 
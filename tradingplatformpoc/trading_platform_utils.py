@@ -1,7 +1,7 @@
 import logging
 import platform
 from datetime import datetime, timedelta
-from typing import Any, Collection, Dict, List
+from typing import Any, Collection, Dict, List, Optional
 
 import numpy as np
 
@@ -64,27 +64,22 @@ def calculate_solar_prod(irradiation_data: pd.Series, pv_sqm: float, pv_efficien
     return irradiation_data * pv_sqm * pv_efficiency / 1000
 
 
-def flatten_collection(collection_of_lists: Collection[Collection[Any]]) -> List[Any]:
-    return [bid for sublist in collection_of_lists for bid in sublist]
-
-
-def nan_helper(y):
-    """Helper to handle indices and logical indices of NaNs.
-
-    Input:
-        - y, 1d numpy array with possible NaNs
-    Output:
-        - nans, logical indices of NaNs
-        - index, a function, with signature indices= index(logical_indices),
-          to convert logical indices of NaNs to 'equivalent' indices
-    Example:
-        >>> # linear interpolation of NaNs
-        >>> y = np.array([1.0, np.nan, 2.0])
-        >>> nans, x= nan_helper(y)
-        >>> y[nans]= np.interp(x(nans), x(~nans), y[~nans])
+def calculate_solar_prod_for_agents(irradiation_data: pd.Series, pv_sqm_per_agent: Dict[str, float],
+                                    pv_efficiency_per_agent: Dict[str, float]) -> pd.DataFrame:
+    """
+    Same as calculate_solar_prod, but for several agents at once: One outer product of the irradiation data and the
+    agents' (square meterage * efficiency), instead of one pd.Series calculation per agent.
+    Returns a pd.DataFrame with the same index as irradiation_data, and one column per agent (the keys of
+    pv_sqm_per_agent), with the solar energy production in kWh.
     """
+    agent_names = list(pv_sqm_per_agent.keys())
+    kw_per_irradiation = np.array([pv_sqm_per_agent[name] * pv_efficiency_per_agent[name] for name in agent_names])
+    return pd.DataFrame(np.outer(irradiation_data.to_numpy() / 1000, kw_per_irradiation),
+                        index=irradiation_data.index, columns=agent_names)
 
-    return np.isnan(y), lambda z: z.nonzero()[0]
+
+def flatten_collection(collection_of_lists: Collection[Collection[Any]]) -> List[Any]:
+    return [bid for sublist in collection_of_lists for bid in sublist]
 
 
 def get_if_exists_else(some_dict: Dict[str, Any], key: str, default_value: Any) -> Any:
@@ -135,13 +130,24 @@ def add_all_to_twice_nested_dict(first_dict: Dict[Any, Dict[Any, dict]], second_
                 add_to_twice_nested_dict(first_dict, k1, k2, k3, v)
 
 
-def get_glpk_solver() -> OptSolver:
+def get_glpk_solver(mip_rel_gap: Optional[float] = None, time_limit_s: Optional[int] = None) -> OptSolver:
+    """
+    By default, GLPK solves to optimality. Optionally, a relative MIP gap and/or a time limit can be specified, to stop
+    earlier. Note that GLPK reports a MIP solve stopped by the gap as optimal, and that an LP stopped by the time limit
+    may also be reported as optimal, even though the solution then isn't.
+    """
     if platform.system() == 'Linux':
         logger.info('Linux system')
-        return pyo.SolverFactory('glpk')
+        solver = pyo.SolverFactory('glpk')
     else:
         logger.info('Not a linux system, using GLPK_PATH')
-        return pyo.SolverFactory('glpk', executable=settings.GLPK_PATH)
+        solver = pyo.SolverFactory('glpk', executable=settings.GLPK_PATH)
+    if mip_rel_gap is not None:
+        solver.options['mipgap'] = mip_rel_gap
+    if time_limit_s is not None:
+        logger.warning('GLPK time limit set to {} s, solutions that hit it may not be optimal'.format(time_limit_s))
+        solver.options['tmlim'] = time_limit_s
+    return solver
 
 
 def get_external_prices(pricing: IPrice, job_id: str,